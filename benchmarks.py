@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for game hot paths.
+
+Each benchmark takes its workload sizes as keyword arguments, which -p
+overrides for every benchmark that has them. Results can be saved as a
+baseline and later compared against it: --compare exits with status 1
+when any metric got worse than the baseline by more than --threshold.
+
+Usage:
+  python benchmarks.py [NAME...] [-p KEY=VALUE...] [--save FILE]
+                       [--compare FILE] [--threshold FRACTION] [--list]
+"""
+
+import argparse
+import curses
+import inspect
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import dino
+import mines
+import mines_save
+import screenbuf
+import space_defense
+import tetris
+
+BASELINE = "benchmarks.json"
+THRESHOLD = 0.25
+# Metrics that describe a workload instead of measuring it: shown in a
+# comparison but never judged. For every other metric, times and counts
+# of calls or bytes alike, lower is better.
+WORKLOAD = {("space_bomb", "particles")}
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def best_of(fn, setup=None, repeat=5):
+    """Return the fastest of `repeat` timed calls to fn, running setup untimed before each."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def sparse_board(size, density, seed=0):
+    g = mines.Game(size, size, int(size * size * density), compact=True, seed=seed)
+    g.place_mines(size // 2, size // 2)
+    return g
+
+
+@benchmark
+def mines_click(size=2000, density=0.005):
+    """Click latency on a large low-density board: region index vs stack flood."""
+    g = sparse_board(size, density)
+    x = y = size // 2
+
+    def clear():
+        g.revealed_cells[:] = bytes(len(g.revealed_cells))
+
+    return {
+        "index_regions": best_of(g.index_regions, repeat=1),
+        "region reveal": best_of(lambda: g.flood_reveal(x, y), clear),
+        "stack flood": best_of(lambda: g.flood_fill(x, y), clear, repeat=1),
+    }
+
+
+@benchmark
+def mines_place(size=5000, density=0.001):
+    """Mine placement plus region indexing on a giant low-density board: thresholding vs sparse sampling."""
+    g = mines.Game(size, size, int(size * size * density), compact=True)
+    safe = size * size // 2
+    return {
+        "dense": best_of(lambda: g.place_mines_dense(safe), g.reset, repeat=3),
+        "sparse": best_of(lambda: g.place_positions(mines.sample_mines(size * size, g.mines, (safe,))), g.reset, repeat=3),
+    }
+
+
+@benchmark
+def mines_flood(size=300, density=0.05):
+    """Placement and first-click reveal on a mid-size board, as played."""
+    g = mines.Game(size, size, int(size * size * density), seed=0)
+    x = y = size // 2
+
+    def reset():
+        g.reset()
+        g.rng.seed(0)
+
+    def clear():
+        for row in g.revealed:
+            row[:] = [False] * size
+
+    return {
+        "place_mines": best_of(lambda: g.place_mines(x, y), reset),
+        "flood_reveal": best_of(lambda: g.flood_reveal(x, y), clear),
+        "check_win": best_of(g.check_win),
+    }
+
+
+@benchmark
+def mines_check_win(size=2000, density=0.005):
+    """Win detection and flag HUD per action: full-board scan vs running counters."""
+    g = sparse_board(size, density)
+    g.flood_reveal(size // 2, size // 2)
+
+    def scan():
+        hidden = sum(1 for y in range(g.h) for x in range(g.w) if g.board[y][x] != -1 and not g.revealed[y][x])
+        flags = sum(1 for row in g.flagged for v in row if v)
+        return hidden, flags
+
+    return {
+        "board scan": best_of(scan, repeat=1),
+        "counters": best_of(lambda: (g.check_win(), g.flags)),
+    }
+
+
+def allocated(fn):
+    """Return the bytes still allocated after calling fn (its result is kept alive)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+@benchmark
+def mines_memory(size=1000, density=0.15):
+    """Board storage per cell: nested lists vs flat planes vs the packed save format, and save/load time."""
+    cells = size * size
+    g = sparse_board(size, density)
+    g.started = True
+    g.reveal(size // 2, size // 2)
+    g.toggle_flag(0, 0)
+    path = os.path.join(tempfile.mkdtemp(), "board.sav")
+    result = {
+        "lists B/cell": allocated(lambda: mines.Game(size, size, 0)) // cells,
+        "planes B/cell": allocated(lambda: mines.Game(size, size, 0, compact=True)) // cells,
+        "packed B/cell": len(mines_save.pack(g)) // cells,
+        "save": best_of(lambda: mines_save.save(g, path)),
+        "load": best_of(lambda: mines_save.load(path)),
+    }
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    return result
+
+
+def crowded_field(enemies, bullets, width=100, height=35, seed=0):
+    """A Space Defense round with the given numbers of enemies and bullets scattered over it."""
+    gs, player = space_defense.reset_round(width, height, False, seed)
+    rng = gs.rng
+    for _ in range(enemies):
+        space_defense.spawn_enemy(gs)
+        gs.enemies[-1].y = rng.uniform(2, height - 6)
+    for _ in range(bullets):
+        gs.bullets.append(space_defense.Bullet(x=rng.randint(2, width - 3), y=rng.uniform(2, height - 4)))
+    points = [(rng.randint(2, width - 3), rng.randint(2, height - 4)) for _ in range(enemies // 4)]
+    gs.explosions.burst(points, space_defense.KILL_PARTICLES, space_defense.KILL_LIFE)
+    for _ in range(enemies // 4):
+        gs.powerups.append(space_defense.PowerUp(x=rng.randint(2, width - 3), y=rng.uniform(2, height - 4), kind="bomb"))
+    return gs, player
+
+
+@benchmark
+def space_update(enemies=150, bullets=150, frames=100):
+    """Space Defense per-frame world update and collision pass on a crowded field."""
+    dt = space_defense.FRAME_TIME
+    state = {}
+
+    def setup():
+        state["gs"], state["player"] = crowded_field(enemies, bullets)
+
+    def updates():
+        gs = state["gs"]
+        for _ in range(frames):
+            space_defense.update_bullets(gs, dt)
+            space_defense.update_enemies(gs, dt)
+            space_defense.update_powerups(gs, dt)
+            space_defense.update_explosions(gs, dt)
+
+    def collisions():
+        space_defense.handle_collisions(state["gs"], state["player"], 0.0)
+
+    return {
+        f"update_* x{frames}": best_of(updates, setup),
+        "handle_collisions": best_of(collisions, setup),
+    }
+
+
+@benchmark
+def space_bomb(enemies=300, frames=15):
+    """A bomb over a crowded field: the detonation frame and the frames of its particles."""
+    state = {}
+
+    def setup():
+        gs, player = state["gs"], state["player"] = crowded_field(enemies, 0)
+        player.bombs = 1
+        state["screen"] = screenbuf.Screen(NullWindow())
+
+    def frame(gs, player, screen):
+        space_defense.update_explosions(gs, space_defense.FRAME_TIME)
+        space_defense.render(screen, gs, player, 0, False)
+
+    def bomb():
+        gs, player, screen = state["gs"], state["player"], state["screen"]
+        space_defense.detonate_bomb(gs, player)
+        frame(gs, player, screen)
+
+    def after():
+        gs, player, screen = state["gs"], state["player"], state["screen"]
+        for _ in range(frames):
+            frame(gs, player, screen)
+
+    with fake_colors():
+        setup()
+        bomb()
+        particles = len(state["gs"].explosions)
+        return {
+            "particles": particles,
+            "bomb frame": best_of(bomb, setup),
+            "later frame": best_of(after, lambda: (setup(), bomb())) / frames,
+        }
+
+
+@benchmark
+def dino_update(frames=5000):
+    """DinoGame.update over a run of ticks with periodic jumps."""
+    state = {}
+
+    def setup():
+        state["g"] = dino.DinoGame(seed=0)
+
+    def run():
+        g = state["g"]
+        for i in range(frames):
+            if i % 15 == 0:
+                g.jump()
+            g.update()
+            if g.game_over:
+                g.reset()
+
+    return {f"update x{frames}": best_of(run, setup)}
+
+
+@benchmark
+def dino_population(runners=500, frames=200):
+    """Time per tick for scripted runners: one Population world vs a DinoGame per runner."""
+    reach = [2 + i % 15 for i in range(runners)]
+
+    def population():
+        g = dino.Population(runners, seed=0)
+        for _ in range(frames):
+            g.act(dino.reach_actions(g, reach))
+            g.update()
+            if g.game_over:
+                g.reset()
+
+    def separate():
+        games = [dino.DinoGame(seed=0) for _ in range(runners)]
+        for _ in range(frames):
+            for g, r in zip(games, reach):
+                if dino.reach_actions(g, (r,))[0]:
+                    g.jump()
+                g.update()
+                if g.game_over:
+                    g.reset()
+
+    return {
+        "population tick": best_of(population, repeat=3) / frames,
+        "separate tick": best_of(separate, repeat=3) / frames,
+    }
+
+
+def stacked_board(g, rows, full=0, seed=0):
+    """Fill the bottom rows of a Tetris board, each with one hole except `full` complete rows on top."""
+    rng = random.Random(seed)
+    for i, y in enumerate(range(tetris.BOARD_H - rows, tetris.BOARD_H)):
+        row = [1] * tetris.BOARD_W
+        if i >= full:
+            row[rng.randrange(tetris.BOARD_W)] = 0
+        g.board[y] = row
+
+
+@benchmark
+def tetris_ops(rows=12, calls=2000):
+    """Tetris collision tests, line clears and hard drops on a stacked board."""
+    rng = random.Random(0)
+    g = tetris.Game(seed=0)
+    stacked_board(g, rows)
+    probes = [
+        (rng.randrange(-2, tetris.BOARD_H), rng.randrange(-1, tetris.BOARD_W), tetris.SHAPES[rng.choice(tetris.PIECES)])
+        for _ in range(calls)
+    ]
+    state = {}
+
+    def collides():
+        for y, x, shape in probes:
+            g.collides(y, x, shape)
+
+    def full_boards():
+        state["boards"] = []
+        for _ in range(calls // 10):
+            t = tetris.Game(seed=0)
+            stacked_board(t, rows, full=4)
+            state["boards"].append(t)
+
+    def clear_lines():
+        for t in state["boards"]:
+            t.clear_lines()
+
+    def fresh():
+        state["g"] = t = tetris.Game(seed=0)
+        stacked_board(t, rows // 2)
+
+    def hard_drops():
+        t = state["g"]
+        for _ in range(calls // 100):
+            if t.game_over:
+                break
+            t.hard_drop()
+
+    return {
+        f"collides x{calls}": best_of(collides),
+        f"clear_lines x{calls // 10}": best_of(clear_lines, full_boards),
+        f"hard_drop x{calls // 100}": best_of(hard_drops, fresh),
+    }
+
+
+class NullWindow:
+    """Stands in for a curses window; screenbuf.FrameStats records what would be sent."""
+
+    def __init__(self, h=40, w=120):
+        self.size = (h, w)
+
+    def getmaxyx(self):
+        return self.size
+
+    def addstr(self, y, x, text, attr=0):
+        pass
+
+    def erase(self):
+        pass
+
+    def refresh(self):
+        pass
+
+
+def render_frames(draw, step, frames, repaint, recorder=None):
+    """Draw `frames` frames; with repaint every frame is sent in full, as erase-and-redraw did."""
+    screen = screenbuf.Screen(NullWindow(), recorder)
+    start = time.perf_counter()
+    for i in range(frames):
+        step(i)
+        if repaint:
+            screen.invalidate()
+        draw(screen)
+    seconds = (time.perf_counter() - start) / frames
+    return screen.stats.calls // frames, screen.stats.bytes // frames, seconds
+
+
+@contextmanager
+def fake_colors():
+    """Let code call curses.color_pair() without a terminal."""
+    color_pair = curses.color_pair
+    curses.color_pair = lambda n: n << 8
+    try:
+        yield
+    finally:
+        curses.color_pair = color_pair
+
+
+def render_games():
+    """Return {game: (draw(screen), step(i))} for a scripted run of each game."""
+    random.seed(0)
+    d = dino.DinoGame(seed=0)
+
+    def dino_step(i):
+        if i % 30 == 0:
+            d.jump()
+        d.update()
+        if d.game_over:
+            d.reset()
+
+    t = tetris.Game(seed=0)
+    moves = (tetris.MOVE_LEFT, tetris.MOVE_RIGHT, tetris.ROTATE, tetris.GRAVITY, tetris.GRAVITY)
+
+    def tetris_step(i):
+        nonlocal t
+        t.apply(random.choice(moves) if i % 20 else tetris.HARD_DROP)
+        if t.game_over:
+            t = tetris.Game(seed=i)
+
+    m = mines.Game(30, 16, 60, seed=0)
+    view = mines.View()
+    field = {}
+    field["gs"], field["player"] = crowded_field(20, 10)
+
+    def space_step(i):
+        gs, player = field["gs"], field["player"]
+        space_defense.apply_action(gs, player, random.randrange(5), i / space_defense.FPS)
+        space_defense.advance(gs, player, i / space_defense.FPS, space_defense.FRAME_TIME)
+        if gs.game_over:
+            field["gs"], field["player"] = crowded_field(20, 10, seed=i)
+
+    def mines_step(i):
+        m.cursor_x, m.cursor_y = random.randrange(m.w), random.randrange(m.h)
+        if i % 10 == 0:
+            m.reveal(m.cursor_x, m.cursor_y)
+        if m.game_over:
+            m.reset()
+
+    return {
+        "dino": (lambda screen: dino.draw(screen, d), dino_step),
+        "tetris": (lambda screen: tetris.draw(screen, t), tetris_step),
+        "mines": (lambda screen: mines.draw(screen, m, view), mines_step),
+        "space": (lambda screen: space_defense.render(screen, field["gs"], field["player"], 0, False), space_step),
+    }
+
+
+@benchmark
+def render(frames=300):
+    """Terminal calls, bytes and time per frame: full repaint vs row-diffed screen buffer."""
+    result = {}
+    for name, (draw, step) in render_games().items():
+        for mode, repaint in (("full", True), ("diff", False)):
+            with fake_colors():
+                calls, nbytes, seconds = render_frames(draw, step, frames, repaint)
+            result[f"{name} {mode} calls"] = calls
+            result[f"{name} {mode} bytes"] = nbytes
+            result[f"{name} {mode} frame"] = seconds
+    return result
+
+
+@benchmark
+def record(frames=300):
+    """Game-thread time per frame added by session recording, and recording bytes per frame."""
+    import recording
+
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in render_games():
+            times = {}
+            for mode in ("plain", "recorded"):
+                best = float("inf")
+                for i in range(5):
+                    # Replay the same scripted run each time.
+                    draw, step = render_games()[name]
+                    recorder = None
+                    if mode == "recorded":
+                        recorder = recording.Recorder(os.path.join(tmp, f"{name}{i}.rec"))
+                    with fake_colors():
+                        best = min(best, render_frames(draw, step, frames, False, recorder)[2])
+                    if recorder is not None:
+                        recorder.close()
+                times[mode] = best
+            result[f"{name} overhead"] = max(0.0, times["recorded"] - times["plain"])
+            result[f"{name} bytes"] = os.path.getsize(os.path.join(tmp, f"{name}0.rec")) // frames
+    return result
+
+
+def fmt(value):
+    # Integer results are counts (the label names the unit), floats are seconds.
+    if isinstance(value, int):
+        return f"{value:10d}   "
+    return f"{value * 1000:10.2f} ms"
+
+
+def parse_param(text):
+    key, _, value = text.partition("=")
+    for kind in (int, float):
+        try:
+            return key, kind(value)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"{text!r} is not KEY=NUMBER")
+
+
+def run(names, params):
+    """Run benchmarks and return {name: {label: value}}, printing each result."""
+    results = {}
+    for name in names:
+        fn = BENCHMARKS[name]
+        accepted = inspect.signature(fn).parameters
+        results[name] = fn(**{k: v for k, v in params.items() if k in accepted})
+        for label, value in results[name].items():
+            print(f"{name:<16} {label:<24} {fmt(value)}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each metric against the baseline; return the metrics worse by more than threshold."""
+    regressions = []
+    print(f"\n{'benchmark':<16} {'metric':<24} {'baseline':>13} {'now':>13}  change")
+    for name, metrics in results.items():
+        for label, value in metrics.items():
+            old = baseline.get(name, {}).get(label)
+            if old is None:
+                continue
+            if old:
+                change = (value - old) / old
+            else:
+                change = float("inf") if value > 0 else 0.0
+            flag = ""
+            if (name, label) in WORKLOAD:
+                flag = "  (workload)"
+            elif change > threshold:
+                regressions.append((name, label))
+                flag = "  REGRESSION"
+            print(f"{name:<16} {label:<24} {fmt(old)} {fmt(value)} {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark game hot paths.")
+    parser.add_argument("names", nargs="*", metavar="NAME")
+    parser.add_argument("-p", "--param", action="append", type=parse_param, default=[], help="workload size, e.g. size=500")
+    parser.add_argument("--save", nargs="?", const=BASELINE, metavar="FILE", help=f"store results as a baseline (default {BASELINE})")
+    parser.add_argument("--compare", nargs="?", const=BASELINE, metavar="FILE", help="fail if worse than this baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown as a fraction (default %(default)s)")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and their parameters")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, fn in BENCHMARKS.items():
+            params = ", ".join(f"{p.name}={p.default}" for p in inspect.signature(fn).parameters.values())
+            print(f"{name:<16} {params}\n    {inspect.getdoc(fn)}")
+        return 0
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    params = dict(args.param)
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            parser.error(f"no baseline at {args.compare}; record one first with --save")
+        except ValueError as e:
+            parser.error(f"cannot read baseline {args.compare}: {e}")
+        if stored.get("params", {}) != params:
+            print(f"warning: baseline was recorded with params {stored.get('params', {})}", file=sys.stderr)
+        baseline = stored["results"]
+
+    results = run(args.names or list(BENCHMARKS), params)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,11 +6,22 @@ Controls:
   ↓         : duck (hold)
   p         : pause
   q         : quit
+
+Usage:
+  python dino.py [--population N]
+
+With --population, N runners share one course, each jumping cacti at its
+own random distance, and the first one still alive is shown.
 """
 
+import argparse
 import curses
 import random
-import time
+
+import gamedb
+import tracing
+from frameclock import FrameClock
+from screenbuf import Screen
 
 GROUND_Y = 18
 WIDTH = 70
@@ -22,7 +33,8 @@ def clamp(v, lo, hi):
 
 
 class DinoGame:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
         self.score = 0
         self.best = 0
         self.speed = 1.0
@@ -75,18 +87,18 @@ class DinoGame:
 
     def spawn_obstacle(self):
         # Mostly cacti, sometimes low-flying bird
-        if random.random() < 0.22 and self.score > 200:
+        if self.rng.random() < 0.22 and self.score > 200:
             h = 1
-            y = GROUND_Y - random.choice([3, 4])
+            y = GROUND_Y - self.rng.choice([3, 4])
             self.obstacles.append({"x": WIDTH - 2, "w": 4, "h": h, "y": y, "kind": "bird"})
         else:
-            h = random.choice([2, 3])
-            w = random.choice([2, 3, 4])
+            h = self.rng.choice([2, 3])
+            w = self.rng.choice([2, 3, 4])
             y = GROUND_Y - h + 1
             self.obstacles.append({"x": WIDTH - 2, "w": w, "h": h, "y": y, "kind": "cactus"})
 
         base = max(18, 46 - int(self.speed * 6))
-        jitter = random.randint(-8, 8)
+        jitter = self.rng.randint(-8, 8)
         self.spawn_timer = max(10, base + jitter)
 
     @staticmethod
@@ -95,10 +107,15 @@ class DinoGame:
         bx, by, bw, bh = b
         return ax < bx + bw and ax + aw > bx and ay < by + bh and ay + ah > by
 
+    @tracing.traced
     def update(self):
         if self.game_over or self.paused:
             return
+        self.move_player()
+        self.advance_world()
+        self.collide()
 
+    def move_player(self):
         # physics (dt-based integration)
         dt = self.tick
         self.player_vy += self.gravity * dt
@@ -112,6 +129,7 @@ class DinoGame:
             self.player_y = float(GROUND_Y)
             self.player_vy = 0.0
 
+    def advance_world(self):
         # obstacles movement
         step = self.speed
         for o in self.obstacles:
@@ -126,7 +144,7 @@ class DinoGame:
         self.score += int(1 + self.speed)
         self.speed = clamp(1.0 + self.score / 600.0, 1.0, 5.0)
 
-        # collisions
+    def collide(self):
         pbox = self.player_box()
         for o in self.obstacles:
             obox = (int(o["x"]), o["y"], o["w"], o["h"])
@@ -136,35 +154,143 @@ class DinoGame:
                 break
 
 
-def draw(stdscr, g: DinoGame):
-    stdscr.erase()
-    stdscr.addstr(0, 2, "DINO RUNNER")
-    stdscr.addstr(1, 2, f"Score: {g.score}")
-    stdscr.addstr(1, 20, f"Best: {g.best}")
-    stdscr.addstr(1, 36, f"Speed: {g.speed:.2f}")
+class Population(DinoGame):
+    """n runners in one world, sharing its obstacle stream, speed and score.
 
-    # sky / ground
-    for x in range(WIDTH):
-        stdscr.addstr(GROUND_Y + 1, x, "_")
+    Runner state is kept in parallel arrays indexed by runner (ys, vys,
+    ducks, alive, scores) and stepped for all runners at once. The world
+    runs exactly as a DinoGame's until the last runner dies, and a
+    runner's score is the world score when it died. The inherited
+    player_* fields follow the shown runner, the first one still alive,
+    so draw() works unchanged.
+    """
+
+    def __init__(self, n, seed=None):
+        super().__init__(seed)
+        self.n = n
+        self.reset_runners()
+
+    def reset(self):
+        super().reset()
+        self.reset_runners()
+
+    def reset_runners(self):
+        n = self.n
+        self.ys = [float(GROUND_Y)] * n
+        self.vys = [0.0] * n
+        self.ducks = bytearray(n)
+        self.alive = bytearray(b"\x01") * n
+        self.scores = [0] * n
+        self.alive_count = n
+        self.shown = 0
+
+    def act(self, actions):
+        """Apply one action per runner: 0 run, 1 jump, 2 duck (as in DinoEnv)."""
+        ground = GROUND_Y - 1e-6
+        jump = self.jump_velocity
+        self.vys = [jump if a == 1 and y >= ground else v for a, y, v in zip(actions, self.ys, self.vys)]
+        self.ducks = bytearray(a == 2 and y >= ground for a, y in zip(actions, self.ys))
+
+    def move_player(self):
+        dt = self.tick
+        dv = self.gravity * dt
+        vys = [v + dv for v in self.vys]
+        ys = [y + v * dt for y, v in zip(self.ys, vys)]
+        # The same clamping as DinoGame.move_player, for every runner.
+        self.vys = [0.0 if y > GROUND_Y else max(0.0, v) if y < 0 else v for y, v in zip(ys, vys)]
+        self.ys = [float(GROUND_Y) if y > GROUND_Y else 0.0 if y < 0 else y for y in ys]
+
+    def hit_table(self):
+        """Return a 256-byte table marking which box keys (see collide) hit an obstacle, or None if none can."""
+        px = self.player_x
+        near = [
+            (int(o["x"]), o["y"], o["w"], o["h"])
+            for o in self.obstacles
+            if int(o["x"]) < px + 4 and int(o["x"]) + o["w"] > px
+        ]
+        if not near:
+            return None
+        table = bytearray(256)
+        for row in range(GROUND_Y + 1):
+            table[row] = any(self.intersects((px, row - 1, 3, 2), o) for o in near)
+        table[GROUND_Y + 1] = any(self.intersects((px, GROUND_Y, 4, 1), o) for o in near)
+        return bytes(table)
+
+    def collide(self):
+        # Every runner shares player_x, so its box depends only on its rounded
+        # row, or GROUND_Y + 1 when ducking: at most GROUND_Y + 2 distinct boxes
+        # are tested against the obstacles, and each runner is a table lookup.
+        hits = self.hit_table()
+        if hits is not None:
+            ground = GROUND_Y - 1e-6
+            keys = bytes(
+                GROUND_Y + 1 if duck and y >= ground else int(round(y)) for y, duck in zip(self.ys, self.ducks)
+            )
+            dying = int.from_bytes(keys.translate(hits), "little") & int.from_bytes(self.alive, "little")
+            if dying:
+                mask = dying.to_bytes(self.n, "little")
+                i = mask.find(1)
+                while i >= 0:
+                    self.alive[i] = 0
+                    self.scores[i] = self.score
+                    self.alive_count -= 1
+                    i = mask.find(1, i + 1)
+        if self.alive_count == 0:
+            self.game_over = True
+            self.best = max(self.best, self.score)
+            return
+        if not self.alive[self.shown]:
+            self.shown = self.alive.find(1)
+        i = self.shown
+        self.player_y = self.ys[i]
+        self.player_vy = self.vys[i]
+        self.ducking = bool(self.ducks[i])
+
+
+def reach_actions(g, reach):
+    """Return population actions where runner i jumps when a cactus is reach[i] columns ahead."""
+    front = g.player_x + 3
+    ahead = [int(o["x"]) - front for o in g.obstacles if o["kind"] == "cactus" and int(o["x"]) + o["w"] > g.player_x]
+    if not ahead:
+        return bytes(len(reach))
+    distance = min(ahead)
+    return bytes(1 if distance <= r else 0 for r in reach)
+
+
+@tracing.traced
+def draw_static(layer):
+    layer.addstr(0, 2, "DINO RUNNER")
+    layer.addstr(GROUND_Y + 1, 0, "_" * WIDTH)
+    layer.addstr(HEIGHT - 2, 2, "space/↑ jump  ↓ duck  p pause  q quit")
+
+
+@tracing.traced
+def draw(screen, g: DinoGame):
+    screen.clear(screen.layer("static", draw_static))
+    screen.addstr(1, 2, f"Score: {g.score}")
+    screen.addstr(1, 20, f"Best: {g.best}")
+    screen.addstr(1, 36, f"Speed: {g.speed:.2f}")
+    if isinstance(g, Population):
+        screen.addstr(1, 50, f"Alive: {g.alive_count}/{g.n}")
 
     # little clouds
     for i in range(3):
         cx = int((WIDTH - (g.score // (20 + i * 5)) % (WIDTH + 20)) - 10)
         cy = 3 + i * 2
         if 0 <= cx < WIDTH - 3:
-            stdscr.addstr(cy, cx, "~~~")
+            screen.addstr(cy, cx, "~~~")
 
     # player
     px, py, pw, ph = g.player_box()
     if g.ducking and g.is_on_ground():
         sprite = "__o>"
         if 0 <= py < HEIGHT:
-            stdscr.addstr(py, px, sprite[:pw])
+            screen.addstr(py, px, sprite[:pw])
     else:
         if 0 <= py < HEIGHT:
-            stdscr.addstr(py, px, " o ")
+            screen.addstr(py, px, " o ")
         if 0 <= py + 1 < HEIGHT:
-            stdscr.addstr(py + 1, px, "/|\\")
+            screen.addstr(py + 1, px, "/|\\")
 
     # obstacles
     for o in g.obstacles:
@@ -176,60 +302,94 @@ def draw(stdscr, g: DinoGame):
             for dy in range(o["h"]):
                 y = o["y"] + dy
                 if 0 <= y < HEIGHT:
-                    stdscr.addstr(y, ox, "|" * o["w"])
+                    screen.addstr(y, ox, "|" * o["w"])
         else:
             y = o["y"]
             if 0 <= y < HEIGHT:
-                stdscr.addstr(y, ox, "<^^>")
-
-    stdscr.addstr(HEIGHT - 2, 2, "space/↑ jump  ↓ duck  p pause  q quit")
+                screen.addstr(y, ox, "<^^>")
 
     if g.paused:
-        stdscr.addstr(HEIGHT // 2, WIDTH // 2 - 4, "PAUSED")
+        screen.addstr(HEIGHT // 2, WIDTH // 2 - 4, "PAUSED")
 
     if g.game_over:
-        stdscr.addstr(HEIGHT // 2 - 1, WIDTH // 2 - 5, "GAME OVER")
-        stdscr.addstr(HEIGHT // 2, WIDTH // 2 - 12, "Press r to restart or q to quit")
+        screen.addstr(HEIGHT // 2 - 1, WIDTH // 2 - 5, "GAME OVER")
+        screen.addstr(HEIGHT // 2, WIDTH // 2 - 12, "Press r to restart or q to quit")
 
-    stdscr.refresh()
+    screen.flush()
 
 
-def run(stdscr):
+def run(stdscr, population=0):
     curses.curs_set(0)
     stdscr.nodelay(True)
     stdscr.keypad(True)
 
-    g = DinoGame()
+    mode = ""
+    if population:
+        g = Population(population)
+        # Each runner's jump distance, the one trait this demo varies.
+        reach = [random.randint(2, 16) for _ in range(population)]
+        mode = f"population {population}"
+    else:
+        g = DinoGame()
     g.spawn_timer = 25
+    store = gamedb.Store()
+    g.best = store.high_score("dino", mode)
+    screen = Screen(stdscr)
+    clock = FrameClock(g.tick)
+    # Seconds of play in this run, not counting pauses.
+    played = 0.0
+
+    try:
+        while True:
+            # A paused or finished game has nothing to animate, so wait for a key.
+            stdscr.nodelay(not (g.game_over or g.paused))
+            key = stdscr.getch()
+            tracing.check_key(key)
+
+            if key == ord("q"):
+                break
 
-    while True:
-        key = stdscr.getch()
-
-        if key == ord("q"):
-            break
-
-        if g.game_over:
-            if key == ord("r"):
-                g.reset()
-            draw(stdscr, g)
-            time.sleep(g.tick)
-            continue
-
-        if key == ord("p"):
-            g.paused = not g.paused
-
-        if key in (ord(" "), curses.KEY_UP):
-            g.jump()
-
-        g.set_duck(key == curses.KEY_DOWN)
-
-        g.update()
-        draw(stdscr, g)
-        time.sleep(g.tick)
+            if g.game_over:
+                if key == ord("r"):
+                    g.reset()
+                    clock.reset()
+                    played = 0.0
+                draw(screen, g)
+                continue
+
+            if key == ord("p"):
+                g.paused = not g.paused
+                clock.reset()
+
+            if not population:
+                if key in (ord(" "), curses.KEY_UP):
+                    g.jump()
+                g.set_duck(key == curses.KEY_DOWN)
+
+            if not g.paused:
+                for _ in clock.steps():
+                    if population:
+                        g.act(reach_actions(g, reach))
+                    g.update()
+                    played += clock.step
+            if g.game_over:
+                store.record(gamedb.Session("dino", g.score, played, mode=mode))
+            draw(screen, g)
+            if not g.paused:
+                clock.wait()
+        if not g.game_over and g.score:
+            store.record(gamedb.Session("dino", g.score, played, mode=mode))
+    finally:
+        store.close()
 
 
 def main():
-    curses.wrapper(run)
+    parser = argparse.ArgumentParser(description="Terminal Dino Runner")
+    parser.add_argument("--population", type=int, default=0, metavar="N", help="run N scripted runners at once")
+    args = parser.parse_args()
+    if args.population < 0:
+        parser.error("--population must not be negative")
+    curses.wrapper(run, args.population)
 
 
 if __name__ == "__main__":
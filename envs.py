@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Headless environments for all four games, single and vectorized.
+
+Every env has the same interface, with no terminal involved:
+
+  obs = env.reset(seed)
+  obs, reward, done = env.step(action)
+
+An observation is the game grid as bytes, row-major with env.shape
+(rows, cols), one small code per cell (see each env's CODES). Actions
+are ints in range(env.n_actions) and the reward is the score the step
+gained.
+
+VectorEnv runs n copies of one env in worker processes. All
+observations live in one shared-memory block of n rows that the workers
+write in place, so only actions, rewards and done flags cross the pipes.
+
+Usage:
+  python envs.py [GAME...]
+"""
+
+import abc
+import multiprocessing
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+import dino
+import mines
+import mines_save
+import space_defense
+import tetris
+
+# Workers are forked so they share the parent's shared-memory tracker,
+# which then unlinks the observation block exactly once.
+FORK = multiprocessing.get_context("fork")
+# Seconds close() waits for a worker to exit before terminating it.
+CLOSE_TIMEOUT = 5
+
+
+class Env(abc.ABC):
+    """One game instance stepped by actions instead of keys."""
+
+    shape = (0, 0)
+    n_actions = 0
+
+    @abc.abstractmethod
+    def reset(self, seed=None):
+        """Start a new game and return its observation."""
+
+    @abc.abstractmethod
+    def step(self, action):
+        """Apply one action; return (obs, reward, done)."""
+
+    @abc.abstractmethod
+    def observe(self):
+        """Return the game grid as bytes."""
+
+
+class TetrisEnv(Env):
+    """Actions are the tetris codes MOVE_LEFT ... GRAVITY, one per step."""
+
+    CODES = {"empty": 0, "block": 1, "piece": 2}
+    shape = (tetris.BOARD_H, tetris.BOARD_W)
+    n_actions = 6
+
+    def __init__(self, bag=False):
+        self.bag = bag
+        self.g = None
+
+    def reset(self, seed=None):
+        self.g = tetris.Game(seed=seed, bag=self.bag)
+        return self.observe()
+
+    def step(self, action):
+        score = self.g.score
+        self.g.apply(action)
+        return self.observe(), self.g.score - score, self.g.game_over
+
+    def observe(self):
+        g = self.g
+        grid = bytearray(b for row in g.board for b in row)
+        for r, row in enumerate(g.cur.shape):
+            for c, cell in enumerate(row):
+                y, x = g.cur.y + r, g.cur.x + c
+                if cell and 0 <= y < tetris.BOARD_H and 0 <= x < tetris.BOARD_W:
+                    grid[y * tetris.BOARD_W + x] = 2
+        return bytes(grid)
+
+
+class DinoEnv(Env):
+    """Actions: 0 run, 1 jump, 2 duck. One step is one game tick."""
+
+    CODES = {"empty": 0, "player": 1, "cactus": 2, "bird": 3}
+    shape = (dino.HEIGHT, dino.WIDTH)
+    n_actions = 3
+
+    def __init__(self):
+        self.g = None
+
+    def reset(self, seed=None):
+        self.g = dino.DinoGame(seed)
+        self.g.spawn_timer = 25
+        return self.observe()
+
+    def step(self, action):
+        g = self.g
+        score = g.score
+        if action == 1:
+            g.jump()
+        g.set_duck(action == 2)
+        g.update()
+        return self.observe(), g.score - score, g.game_over
+
+    def observe(self):
+        g = self.g
+        rows, cols = self.shape
+        grid = bytearray(rows * cols)
+
+        def fill(x, y, w, h, code):
+            x0, x1 = max(0, x), min(cols, x + w)
+            for r in range(max(0, y), min(rows, y + h)):
+                grid[r * cols + x0:r * cols + x1] = bytes((code,)) * (x1 - x0)
+
+        fill(*g.player_box(), 1)
+        for o in g.obstacles:
+            fill(int(o["x"]), o["y"], o["w"], o["h"], 2 if o["kind"] == "cactus" else 3)
+        return bytes(grid)
+
+
+class SpaceEnv(Env):
+    """Actions are space_defense.NOOP ... BOMB; one step is one frame at FPS."""
+
+    CODES = {"empty": 0, "player": 1, "enemy": 2, "boss": 3, "bullet": 4, "shield": 5, "bomb": 6}
+    n_actions = 5
+
+    def __init__(self, width=60, height=24, hardcore=False):
+        self.shape = (height, width)
+        self.hardcore = hardcore
+        self.gs = self.player = None
+        self.now = 0.0
+
+    def reset(self, seed=None):
+        height, width = self.shape
+        self.gs, self.player = space_defense.reset_round(width, height, self.hardcore, seed)
+        self.now = 0.0
+        return self.observe()
+
+    def step(self, action):
+        gs, player = self.gs, self.player
+        score = gs.score
+        space_defense.apply_action(gs, player, action, self.now)
+        space_defense.advance(gs, player, self.now, space_defense.FRAME_TIME)
+        self.now += space_defense.FRAME_TIME
+        return self.observe(), gs.score - score, gs.game_over
+
+    def observe(self):
+        gs = self.gs
+        rows, cols = self.shape
+        grid = bytearray(rows * cols)
+
+        def put(x, y, code):
+            if 0 <= x < cols and 0 <= y < rows:
+                grid[y * cols + x] = code
+
+        for e in gs.enemies:
+            ex, ey, ew, eh = space_defense.enemy_hitbox(e)
+            for dy in range(eh):
+                for dx in range(ew):
+                    put(ex + dx, ey + dy, 3 if e.kind == "boss" else 2)
+        for b in gs.bullets:
+            put(b.x, int(round(b.y)), 4)
+        for p in gs.powerups:
+            put(p.x, int(round(p.y)), 5 if p.kind == "shield" else 6)
+        put(self.player.x, rows - 3, 1)
+        return bytes(grid)
+
+
+class MinesEnv(Env):
+    """Action a < w*h reveals cell a, a >= w*h toggles the flag on cell a - w*h.
+
+    The reward is the number of cells a step opened, or -1 for hitting a mine.
+    """
+
+    CODES = {"number": range(9), "hidden": 9, "flagged": 10, "mine": 11}
+    # Packed save byte (see mines_save) to observation code.
+    TABLE = bytes(
+        (11 if b & 0x0F == mines_save.MINE else b & 0x0F) if b & mines_save.REVEALED
+        else 10 if b & mines_save.FLAGGED else 9
+        for b in range(256)
+    )
+
+    def __init__(self, w=mines.W, h=mines.H, mine_count=mines.MINES):
+        self.shape = (h, w)
+        self.n_actions = 2 * w * h
+        self.mine_count = mine_count
+        self.g = None
+
+    def reset(self, seed=None):
+        h, w = self.shape
+        self.g = mines.Game(w, h, self.mine_count, compact=w * h > mines.COMPACT_CELLS, seed=seed)
+        return self.observe()
+
+    def step(self, action):
+        g = self.g
+        opened = g.revealed_count
+        y, x = divmod(action % (g.w * g.h), g.w)
+        if action < g.w * g.h:
+            g.reveal(x, y)
+        else:
+            g.toggle_flag(x, y)
+        reward = -1 if g.game_over and not g.win else g.revealed_count - opened
+        return self.observe(), reward, g.game_over
+
+    def observe(self):
+        return mines_save.pack(self.g).translate(self.TABLE)
+
+
+ENVS = {
+    "tetris": TetrisEnv,
+    "dino": DinoEnv,
+    "space": SpaceEnv,
+    "mines": MinesEnv,
+}
+
+
+def make(name, **kwargs):
+    return ENVS[name](**kwargs)
+
+
+class EnvSlice:
+    """Envs start .. start+count-1 of a vector env, writing observations into buf."""
+
+    def __init__(self, name, kwargs, buf, start, count, seed):
+        self.envs = [make(name, **kwargs) for _ in range(count)]
+        rows, cols = self.envs[0].shape
+        self.size = rows * cols
+        self.buf = buf
+        self.start = start
+        # Seeds for episodes started automatically after one ends, one
+        # stream per env so they do not depend on how envs are split.
+        self.seeders = [random.Random(seed + start + j) for j in range(count)]
+
+    def write(self, j, obs):
+        o = (self.start + j) * self.size
+        self.buf[o:o + self.size] = obs
+
+    def reset(self, seed):
+        for j, env in enumerate(self.envs):
+            self.write(j, env.reset(seed + self.start + j))
+
+    def step(self, actions):
+        rewards = []
+        dones = []
+        for j, (env, action) in enumerate(zip(self.envs, actions)):
+            obs, reward, done = env.step(action)
+            if done:
+                obs = env.reset(self.seeders[j].getrandbits(64))
+            self.write(j, obs)
+            rewards.append(reward)
+            dones.append(done)
+        return rewards, dones
+
+
+def worker(conn, shm_name, name, kwargs, start, count, seed):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    envs = EnvSlice(name, kwargs, shm.buf, start, count, seed)
+    try:
+        while True:
+            command, arg = conn.recv()
+            if command == "reset":
+                envs.reset(arg)
+                conn.send(None)
+            elif command == "step":
+                conn.send(envs.step(arg))
+            else:
+                break
+    finally:
+        envs.buf = None
+        shm.close()
+
+
+class VectorEnv:
+    """n copies of one env stepped together, auto-resetting finished episodes.
+
+    obs is a memoryview of n * rows * cols bytes, row i being env i's
+    observation; it is updated in place by reset() and step(). An env whose
+    step reports done has already started a new episode in obs. With
+    workers=0 everything runs in this process.
+    """
+
+    def __init__(self, name, n, workers=None, seed=0, **kwargs):
+        probe = make(name, **kwargs)
+        self.n = n
+        self.shape = probe.shape
+        self.n_actions = probe.n_actions
+        self.size = self.shape[0] * self.shape[1]
+        self.seed = seed
+        self.shm = None
+        self.conns = []
+        self.procs = []
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, n)
+        if workers == 0:
+            self.buf = bytearray(n * self.size)
+            self.local = EnvSlice(name, kwargs, self.buf, 0, n, seed)
+            self.obs = memoryview(self.buf)
+            return
+        self.local = None
+        self.shm = shared_memory.SharedMemory(create=True, size=n * self.size)
+        self.obs = self.shm.buf[:n * self.size]
+        per, extra = divmod(n, workers)
+        start = 0
+        for k in range(workers):
+            count = per + (k < extra)
+            parent, child = FORK.Pipe()
+            proc = FORK.Process(
+                target=worker, args=(child, self.shm.name, name, kwargs, start, count, seed), daemon=True
+            )
+            proc.start()
+            # Only the worker holds the child end, so its death reads as EOF.
+            child.close()
+            self.conns.append((parent, start, count))
+            self.procs.append(proc)
+            start += count
+
+    def reset(self, seed=None):
+        """Reset env i with seed + i (the constructor's seed by default)."""
+        if seed is None:
+            seed = self.seed
+        if self.local is not None:
+            self.local.reset(seed)
+            return self.obs
+        for conn, _, _ in self.conns:
+            conn.send(("reset", seed))
+        for conn, _, _ in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        """Return (obs, rewards, dones) after applying actions[i] to env i."""
+        if self.local is not None:
+            rewards, dones = self.local.step(actions)
+            return self.obs, rewards, dones
+        for conn, start, count in self.conns:
+            conn.send(("step", actions[start:start + count]))
+        rewards = []
+        dones = []
+        for conn, _, _ in self.conns:
+            r, d = conn.recv()
+            rewards += r
+            dones += d
+        return self.obs, rewards, dones
+
+    def observation(self, i):
+        return self.obs[i * self.size:(i + 1) * self.size]
+
+    def close(self):
+        """Stop the workers and free the shared block, even if a worker has died."""
+        try:
+            for conn, _, _ in self.conns:
+                try:
+                    conn.send(("close", None))
+                except (BrokenPipeError, EOFError):
+                    pass
+            for proc in self.procs:
+                proc.join(CLOSE_TIMEOUT)
+                if proc.is_alive():
+                    proc.terminate()
+                    proc.join()
+            for conn, _, _ in self.conns:
+                conn.close()
+        finally:
+            self.conns = []
+            self.procs = []
+            if self.shm is not None:
+                self.obs.release()
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(name, n=64, steps=200, workers=None, seed=0):
+    """Return env steps per second for n envs of `name` under random actions."""
+    rng = random.Random(seed)
+    with VectorEnv(name, n, workers, seed) as env:
+        env.reset()
+        plan = [[rng.randrange(env.n_actions) for _ in range(n)] for _ in range(steps)]
+        start = time.perf_counter()
+        for actions in plan:
+            env.step(actions)
+        return n * steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    for game in sys.argv[1:] or ENVS:
+        local = benchmark(game, workers=0)
+        pooled = benchmark(game)
+        print(f"{game:<8} {local:12,.0f} steps/s in process  {pooled:12,.0f} steps/s on {os.cpu_count()} workers")
@@ -0,0 +1,125 @@
+"""
+Frame pacing shared by the games, on the monotonic perf_counter clock.
+
+A FrameClock keeps simulated time in fixed steps. due() says how many
+steps real time has made due (the simulation runs exactly that many,
+independent of how often the screen is drawn), and wait() sleeps until
+the next one. Because steps are counted on simulated time, a late wakeup
+delays a frame without making the game drift. Loops that wait inside
+curses getch() use timeout_ms() instead of wait().
+
+Set FRAME_STATS=1 to print step lateness, overruns and dropped steps
+when a game exits. Set FRAME_SPIN=MS to spin through the last MS
+milliseconds before each deadline instead of sleeping them: sleep can
+wake a millisecond or so late, and spinning trades CPU for that.
+"""
+
+import atexit
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+FRAME_STATS = os.environ.get("FRAME_STATS")
+# The last stretch before a deadline that is spun instead of slept; off
+# by default, as the games do not need sub-millisecond frames.
+SPIN = float(os.environ.get("FRAME_SPIN") or 0) / 1000
+# Steps run at most per due() call; more lag than that is dropped.
+MAX_STEPS = 5
+
+
+@dataclass
+class ClockStats:
+    steps: int = 0
+    late_total: float = 0.0
+    late_max: float = 0.0
+    overruns: int = 0
+    dropped: int = 0
+
+    def record(self, lateness):
+        self.steps += 1
+        self.late_total += lateness
+        self.late_max = max(self.late_max, lateness)
+
+    def merge(self, other):
+        self.steps += other.steps
+        self.late_total += other.late_total
+        self.late_max = max(self.late_max, other.late_max)
+        self.overruns += other.overruns
+        self.dropped += other.dropped
+
+    def summary(self):
+        mean = self.late_total / max(1, self.steps)
+        return (
+            f"{self.steps} steps, lateness mean {mean * 1000:.3f} ms max {self.late_max * 1000:.3f} ms, "
+            f"{self.overruns} overruns, {self.dropped} dropped steps"
+        )
+
+
+# The stats of every clock made while FRAME_STATS is set, merged at exit.
+clock_stats = []
+
+
+def print_stats():
+    total = ClockStats()
+    for stats in clock_stats:
+        total.merge(stats)
+    print(f"frames: {total.summary()}", file=sys.stderr)
+
+
+if FRAME_STATS:
+    atexit.register(print_stats)
+
+
+class FrameClock:
+    def __init__(self, step, max_steps=MAX_STEPS):
+        self.step = step
+        self.max_steps = max_steps
+        self.stats = ClockStats()
+        self.reset()
+        if FRAME_STATS:
+            clock_stats.append(self.stats)
+
+    def reset(self):
+        """Start pacing from now, e.g. after a pause, without counting the gap as lag."""
+        self.time = time.perf_counter()
+
+    def due(self):
+        """Return how many steps are due now and advance simulated time past them."""
+        now = time.perf_counter()
+        n = int((now - self.time) / self.step)
+        if n <= 0:
+            return 0
+        self.stats.record(now - self.time - self.step)
+        if n > self.max_steps:
+            self.stats.dropped += n - self.max_steps
+            self.time = now - self.max_steps * self.step
+            n = self.max_steps
+        self.time += n * self.step
+        return n
+
+    def steps(self):
+        """Yield the simulated time at the end of each due step."""
+        n = self.due()
+        start = self.time - n * self.step
+        for i in range(1, n + 1):
+            yield start + i * self.step
+
+    def timeout_ms(self):
+        """Milliseconds until the next step is due, rounded up, for getch() timeouts."""
+        return max(0, math.ceil((self.time + self.step - time.perf_counter()) * 1000))
+
+    def wait(self):
+        """Sleep until the next step is due, spinning through the last SPIN seconds if set."""
+        deadline = self.time + self.step
+        now = time.perf_counter()
+        if now >= deadline:
+            # The frame's work took longer than a step.
+            self.stats.overruns += 1
+            return
+        if deadline - now > SPIN:
+            time.sleep(deadline - now - SPIN)
+        if SPIN:
+            while time.perf_counter() < deadline:
+                pass
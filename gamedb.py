@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Leaderboards, session stats and settings for all four games in one SQLite file.
+
+The database runs in WAL mode, so a game writing never blocks another
+game or the leaderboard reading. Games do not write on their own thread:
+record() and set_setting() only queue a row, and a background writer
+commits everything queued so far in one transaction. Reads run on the
+caller's connection; top-N and personal-best queries are each served by
+an index, (game, mode, score) and (game, player, mode, score), plus a
+partial index on clear time for games won against the clock.
+
+A session's mode separates leaderboards that should not mix, such as
+Space Defense hardcore or a Minesweeper board size. Set GAMES_DB to use
+another file than ~/.terminal_games.db.
+
+Usage:
+  python gamedb.py [-n N] [GAME...]
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass, field, fields
+
+DB_PATH = os.environ.get("GAMES_DB") or os.path.join(os.path.expanduser("~"), ".terminal_games.db")
+GAMES = ("dino", "mines", "space", "tetris")
+
+# getpass.getuser() without importing getpass, which every game would pay for.
+PLAYER = next((os.environ[k] for k in ("LOGNAME", "USER", "LNAME", "USERNAME") if os.environ.get(k)), None)
+if PLAYER is None:
+    try:
+        import pwd
+
+        PLAYER = pwd.getpwuid(os.getuid()).pw_name
+    except (ImportError, KeyError):
+        PLAYER = "player"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    game TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    level INTEGER,
+    lines INTEGER,
+    clear_time REAL,
+    ended REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_top ON sessions (game, mode, score DESC);
+CREATE INDEX IF NOT EXISTS sessions_player ON sessions (game, player, mode, score DESC);
+CREATE INDEX IF NOT EXISTS sessions_clear ON sessions (game, mode, clear_time) WHERE clear_time IS NOT NULL;
+CREATE TABLE IF NOT EXISTS settings (
+    game TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (game, key)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class Session:
+    """One finished game; clear_time is set only for a game won against the clock."""
+
+    game: str
+    score: int
+    duration: float
+    mode: str = ""
+    level: int = None
+    lines: int = None
+    clear_time: float = None
+    player: str = PLAYER
+    ended: float = field(default_factory=time.time)
+
+
+COLUMNS = ", ".join(f.name for f in fields(Session))
+INSERT_SESSION = f"INSERT INTO sessions ({COLUMNS}) VALUES ({', '.join('?' * len(fields(Session)))})"
+UPSERT_SETTING = "INSERT INTO settings (game, key, value) VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET value = excluded.value"
+# Leaderboard orderings; each matches one of the indexes above.
+RANKINGS = {
+    "score": ("TRUE", "score DESC"),
+    "clear_time": ("clear_time IS NOT NULL", "clear_time"),
+}
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only syncs at checkpoints and is still crash-safe.
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class Store:
+    """The shared games database; if it cannot be opened, writes are dropped and reads are empty."""
+
+    def __init__(self, path=DB_PATH):
+        self.queue = queue.Queue()
+        self.db = self.writer = None
+        try:
+            writer = connect(path)
+            writer.executescript(SCHEMA)
+            self.db = connect(path)
+        except (sqlite3.Error, OSError):
+            return
+        self.db.row_factory = sqlite3.Row
+        self.writer = threading.Thread(target=self._write, args=(writer,), daemon=True)
+        self.writer.start()
+
+    def _write(self, db):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    for item in batch:
+                        if item is not None:
+                            db.execute(*item)
+            except sqlite3.Error:
+                # A lost score is better than a crashed game.
+                pass
+            for _ in batch:
+                self.queue.task_done()
+            if None in batch:
+                db.close()
+                return
+
+    def record(self, session):
+        """Queue a finished session for writing."""
+        if self.writer is not None:
+            self.queue.put((INSERT_SESSION, astuple(session)))
+
+    def set_setting(self, game, key, value):
+        """Queue a JSON-serializable setting for writing."""
+        if self.writer is not None:
+            self.queue.put((UPSERT_SETTING, (game, key, json.dumps(value))))
+
+    def flush(self):
+        """Wait until everything queued so far is committed."""
+        if self.writer is not None:
+            self.queue.join()
+
+    def query(self, sql, params):
+        if self.db is None:
+            return []
+        try:
+            return self.db.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def setting(self, game, key, default=None):
+        rows = self.query("SELECT value FROM settings WHERE game = ? AND key = ?", (game, key))
+        return json.loads(rows[0]["value"]) if rows else default
+
+    def top(self, game, n=10, mode="", by="score"):
+        """Return the n best sessions of game in mode, best first."""
+        where, order = RANKINGS[by]
+        sql = f"SELECT {COLUMNS} FROM sessions WHERE game = ? AND mode = ? AND {where} ORDER BY {order} LIMIT ?"
+        return [Session(**row) for row in self.query(sql, (game, mode, n))]
+
+    def personal_best(self, game, player=PLAYER, mode="", by="score"):
+        """Return player's best session of game in mode, or None."""
+        where, order = RANKINGS[by]
+        sql = (
+            f"SELECT {COLUMNS} FROM sessions WHERE game = ? AND player = ? AND mode = ? AND {where} "
+            f"ORDER BY {order} LIMIT 1"
+        )
+        rows = self.query(sql, (game, player, mode))
+        return Session(**rows[0]) if rows else None
+
+    def high_score(self, game, mode=""):
+        """Return the best score anyone has recorded for game in mode, 0 if none."""
+        rows = self.query("SELECT MAX(score) FROM sessions WHERE game = ? AND mode = ?", (game, mode))
+        return (rows[0][0] or 0) if rows else 0
+
+    def modes(self, game):
+        return [row["mode"] for row in self.query("SELECT DISTINCT mode FROM sessions WHERE game = ?", (game,))]
+
+    def close(self):
+        """Commit what is queued, stop the writer and close the database."""
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fmt_session(s):
+    extra = "".join(
+        f"  {name} {value}"
+        for name, value in (("level", s.level), ("lines", s.lines))
+        if value is not None
+    )
+    if s.clear_time is not None:
+        extra += f"  cleared in {s.clear_time:.1f}s"
+    day = time.strftime("%Y-%m-%d", time.localtime(s.ended))
+    return f"{s.score:>8}  {s.player:<12} {s.duration:7.1f}s{extra}  {day}"
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the leaderboards and your personal bests")
+    parser.add_argument("games", nargs="*", metavar="GAME", help=f"any of {', '.join(GAMES)} (default all)")
+    parser.add_argument("-n", type=int, default=10, help="entries per leaderboard")
+    args = parser.parse_args(argv)
+    for game in args.games:
+        if game not in GAMES:
+            parser.error(f"unknown game {game!r}")
+    with Store() as store:
+        for game in args.games or GAMES:
+            for mode in store.modes(game):
+                print(f"{game} {mode}".rstrip())
+                for i, s in enumerate(store.top(game, args.n, mode), 1):
+                    print(f"{i:3}. {fmt_session(s)}")
+                best = store.personal_best(game, mode=mode)
+                if best is not None:
+                    print(f"  your best: {fmt_session(best)}")
+                fastest = store.top(game, 1, mode, by="clear_time")
+                if fastest:
+                    print(f"  fastest clear: {fastest[0].clear_time:.1f}s by {fastest[0].player}")
+                print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+One entry point for all four games.
+
+The menu imports a game only when it is picked. The curses session and
+every imported module stay alive between games: quitting a game returns
+to the menu, and starting another one (or the same one again) skips
+interpreter startup, imports and terminal setup. Tables a module builds
+at import, like the Tetris rotations, are built once per process.
+
+--report prints, on exit, how long curses setup and the menu took and,
+for each launch, the game's import time and its time to first frame,
+followed by an -X importtime breakdown of each game launched.
+
+Usage:
+  python launcher.py [GAME] [--report]
+"""
+
+import argparse
+import curses
+import importlib
+import subprocess
+import sys
+import time
+
+from screenbuf import Screen
+
+# name: (title, module, function taking stdscr)
+GAMES = {
+    "dino": ("Dino Runner", "dino", "run"),
+    "tetris": ("Tetris", "tetris", "main"),
+    "mines": ("Minesweeper", "mines", "run"),
+    "space": ("Space Defense", "space_defense", "game"),
+}
+# Modules listed per game in the importtime breakdown.
+IMPORTTIME_TOP = 8
+
+
+class FirstFrame:
+    """A window that notes when it is first refreshed, passing everything through."""
+
+    def __init__(self, stdscr, start):
+        self.stdscr = stdscr
+        self.start = start
+        self.seconds = None
+
+    def refresh(self):
+        self.stdscr.refresh()
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self.start
+
+    def __getattr__(self, name):
+        return getattr(self.stdscr, name)
+
+
+def draw_menu(screen, selected):
+    screen.clear()
+    screen.addstr(1, 2, "TERMINAL GAMES")
+    for i, (title, _, _) in enumerate(GAMES.values()):
+        marker = ">" if i == selected else " "
+        screen.addstr(3 + i, 2, f"{marker} {i + 1}. {title}")
+    screen.addstr(4 + len(GAMES), 2, "↑/↓ select, Enter play, 1-4 pick, q quit")
+    screen.flush()
+
+
+def launch(stdscr, name, launches):
+    """Run game `name` on stdscr until it returns, recording (name, import s, first frame s, cached)."""
+    _, module, entry = GAMES[name]
+    start = time.perf_counter()
+    cached = module in sys.modules
+    game = importlib.import_module(module)
+    imported = time.perf_counter() - start
+    window = FirstFrame(stdscr, start)
+    try:
+        getattr(game, entry)(window)
+    finally:
+        launches.append((name, imported, window.seconds, cached))
+        # Leave the window as the menu expects it, whatever the game set.
+        stdscr.nodelay(False)
+        stdscr.timeout(-1)
+        stdscr.keypad(True)
+
+
+def menu(stdscr, first, timings, launches, started):
+    timings.append(("curses setup", time.perf_counter() - started))
+    curses.curs_set(0)
+    stdscr.keypad(True)
+    screen = Screen(stdscr)
+    names = list(GAMES)
+    selected = 0
+    if first is not None:
+        launch(stdscr, first, launches)
+        selected = names.index(first)
+    draw_menu(screen, selected)
+    timings.append(("menu first frame", time.perf_counter() - started))
+    while True:
+        key = stdscr.getch()
+        if key in (ord("q"), ord("Q")):
+            return
+        if key == curses.KEY_UP:
+            selected = (selected - 1) % len(names)
+        elif key == curses.KEY_DOWN:
+            selected = (selected + 1) % len(names)
+        elif ord("1") <= key < ord("1") + len(names) or key in (10, 13, curses.KEY_ENTER):
+            if key not in (10, 13, curses.KEY_ENTER):
+                selected = key - ord("1")
+            launch(stdscr, names[selected], launches)
+            screen.invalidate()
+        draw_menu(screen, selected)
+
+
+def importtime(module):
+    """Return [(cumulative us, self us, name)] from a child `python -X importtime -c "import module"`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(own), name.rstrip()))
+    return rows
+
+
+def print_report(timings, launches):
+    out = sys.stderr
+    print("startup", file=out)
+    for label, seconds in timings:
+        print(f"  {label:<24} {seconds * 1000:8.1f} ms", file=out)
+    print("launches", file=out)
+    for name, imported, first, cached in launches:
+        frame = f"{first * 1000:8.1f} ms" if first is not None else "       -   "
+        how = "cached" if cached else "import"
+        print(f"  {name:<8} {how} {imported * 1000:8.1f} ms  first frame {frame}", file=out)
+    for name in dict.fromkeys(name for name, *_ in launches):
+        module = GAMES[name][1]
+        print(f"importtime: {module} (cumulative | self, us)", file=out)
+        for cumulative, own, mod in sorted(importtime(module), reverse=True)[:IMPORTTIME_TOP]:
+            print(f"  {cumulative:8d} | {own:8d} | {mod}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play the terminal games from one menu")
+    parser.add_argument("game", nargs="?", choices=list(GAMES), help="start this game right away")
+    parser.add_argument("--report", action="store_true", help="print startup and launch timings on exit")
+    args = parser.parse_args(argv)
+    timings = []
+    launches = []
+    started = time.perf_counter()
+    try:
+        curses.wrapper(menu, args.game, timings, launches, started)
+    finally:
+        if args.report:
+            print_report(timings, launches)
+
+
+if __name__ == "__main__":
+    main()
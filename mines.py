@@ -4,32 +4,138 @@ Terminal Minesweeper (curses)
 
 Controls:
   Arrow keys / WASD : move cursor
+  PgUp/PgDn/Home/End: move cursor a screen at a time
   Space or Enter    : reveal cell
   F                 : flag/unflag
+  H                 : hint (move to the safest cell)
+  P                 : autoplay safe moves on/off
   R                 : restart
   Q                 : quit
+
+Usage:
+  python mines.py [--width W] [--height H] [--mines N] [--no-guess] [--save FILE]
+
+With --save, an unfinished game is written to FILE on quit and resumed
+from it on the next start.
 """
 
+import argparse
+import bisect
 import curses
+import os
 import random
+import re
 import time
 
+import gamedb
+import tracing
+from screenbuf import Screen
+
 
 W, H = 12, 12
 MINES = 20
 
+ZERO_RUN = re.compile(b"\x00+")
+
+# Boards larger than this use flat one-byte-per-cell storage.
+COMPACT_CELLS = 100_000
+# Below this mine density, placement samples mine indices and counts around
+# each mine instead of processing every cell.
+SPARSE_DENSITY = 0.006
+# Count byte of a non-mine cell after one more neighbouring mine.
+INCREMENT = bytes(v + 1 if v < 8 else v for v in range(256))
+
+MINIMAP_W, MINIMAP_H = 16, 8
+# Delay between autoplay moves; otherwise the loop sleeps until input or the next timer second.
+AUTOPLAY_MS = 20
+# Top-left screen position of the board window.
+TOP, LEFT = 4, 2
+MINIMAP_SHADES = "·░▒▓█"
+
+
+def row_views(buf, w, h, fmt="B"):
+    """Split a flat w*h buffer into h writable row views indexed [y][x]."""
+    mv = memoryview(buf).cast(fmt)
+    return [mv[y * w:(y + 1) * w] for y in range(h)]
+
+
+def sample_mines(n, k, exclude=(), rng=random):
+    """Return a set of k distinct cell indices in range(n), none of them in exclude.
+
+    Floyd's algorithm draws the sample with k random numbers and no list of
+    candidates; indices are then shifted past the excluded cells.
+    """
+    skip = sorted(exclude)
+    if not 0 <= k <= n - len(skip):
+        raise ValueError("Sample larger than population or is negative")
+    picked = set()
+    for j in range(n - len(skip) - k, n - len(skip)):
+        t = rng.randrange(j + 1)
+        picked.add(j if t in picked else t)
+    if not skip:
+        return picked
+    result = set()
+    for i in picked:
+        for e in skip:
+            if i >= e:
+                i += 1
+        result.add(i)
+    return result
+
+
+def neighbor_counts(mines, w, h):
+    """Return the board bytes for a flat 0/1 mine map: neighbour counts, 0xFF on mines.
+
+    The map is read as one little-endian integer with a byte lane per cell,
+    so shifting by 8 bits moves every cell one column and by 8*w bits one
+    row. Summing the shifted copies counts all neighbours in a few big-int
+    operations; a count never exceeds 8, so lanes do not carry.
+    """
+    n = w * h
+    m = int.from_bytes(mines, "little")
+    not_first = int.from_bytes((b"\x00" + b"\xff" * (w - 1)) * h, "little")
+    not_last = int.from_bytes((b"\xff" * (w - 1) + b"\x00") * h, "little")
+    row = m + ((m << 8) & not_first) + ((m >> 8) & not_last)
+    counts = row + ((row << (8 * w)) & ((1 << (8 * n)) - 1)) + (row >> (8 * w)) - m
+    return (counts | (m * 0xFF)).to_bytes(n, "little")
+
 
 class Game:
-    def __init__(self, w=W, h=H, mines=MINES):
+    def __init__(self, w=W, h=H, mines=MINES, compact=False, seed=None):
+        self.rng = random.Random(seed)
         self.w = w
         self.h = h
         self.mines = mines
+        # Compact boards keep each grid in one flat buffer (one byte per cell)
+        # and expose row views, so board[y][x] works the same in both modes.
+        self.compact = compact
+        # Counts resets, so the screen knows a new game needs a full frame.
+        self.generation = 0
         self.reset()
 
     def reset(self):
-        self.board = [[0 for _ in range(self.w)] for _ in range(self.h)]
-        self.revealed = [[False for _ in range(self.w)] for _ in range(self.h)]
-        self.flagged = [[False for _ in range(self.w)] for _ in range(self.h)]
+        self.generation += 1
+        if self.compact:
+            n = self.w * self.h
+            self.cells = bytearray(n)
+            self.revealed_cells = bytearray(n)
+            self.flagged_cells = bytearray(n)
+            self.board = row_views(self.cells, self.w, self.h, "b")
+            self.revealed = row_views(self.revealed_cells, self.w, self.h)
+            self.flagged = row_views(self.flagged_cells, self.w, self.h)
+        else:
+            self.board = [[0 for _ in range(self.w)] for _ in range(self.h)]
+            self.revealed = [[False for _ in range(self.w)] for _ in range(self.h)]
+            self.flagged = [[False for _ in range(self.w)] for _ in range(self.h)]
+        # Filled by index_regions() once mines are placed.
+        self.run_starts = None
+        self.run_ids = None
+        self.region_spans = None
+        # Running totals kept up to date by reveal/flood/flag so that win
+        # checks and the HUD never scan the board.
+        self.hidden_safe = self.w * self.h - self.mines
+        self.revealed_count = 0
+        self.flags = 0
         self.cursor_x = 0
         self.cursor_y = 0
         self.game_over = False
@@ -50,17 +156,171 @@ class Game:
                     yield nx, ny
 
     def place_mines(self, safe_x, safe_y):
-        candidates = [(x, y) for y in range(self.h) for x in range(self.w) if not (x == safe_x and y == safe_y)]
-        for x, y in random.sample(candidates, self.mines):
-            self.board[y][x] = -1
-
-        for y in range(self.h):
-            for x in range(self.w):
-                if self.board[y][x] == -1:
-                    continue
-                self.board[y][x] = sum(1 for nx, ny in self.neighbors(x, y) if self.board[ny][nx] == -1)
-
+        n = self.w * self.h
+        safe = safe_y * self.w + safe_x
+        if self.compact and self.mines > n * SPARSE_DENSITY:
+            self.place_mines_dense(safe)
+        else:
+            self.place_positions(sample_mines(n, self.mines, (safe,), self.rng))
+
+    def place_mines_dense(self, safe):
+        # Threshold one random byte per cell to get close to the wanted
+        # density in C, then add or remove single random mines until the
+        # count is exact. Every cell but the safe one is treated alike, so
+        # the layout is still a uniform choice of `mines` cells.
+        n = self.w * self.h
+        if not 0 <= self.mines < n:
+            # The safe cell stays free, so the loop below could never end.
+            raise ValueError("Sample larger than population or is negative")
+        cut = 256 * self.mines // n
+        mine_map = bytearray(self.rng.randbytes(n).translate(bytes(int(b < cut) for b in range(256))))
+        mine_map[safe] = 0
+        placed = mine_map.count(1)
+        while placed != self.mines:
+            i = self.rng.randrange(n)
+            if i == safe:
+                continue
+            if placed < self.mines and not mine_map[i]:
+                mine_map[i] = 1
+                placed += 1
+            elif placed > self.mines and mine_map[i]:
+                mine_map[i] = 0
+                placed -= 1
+        self.place_layout(mine_map)
+
+    def place_layout(self, mine_map):
+        """Use a given flat 0/1 mine map (one byte per cell, row-major)."""
+        counts = neighbor_counts(mine_map, self.w, self.h)
+        if self.compact:
+            self.cells[:] = counts
+        else:
+            for y in range(self.h):
+                row = counts[y * self.w:(y + 1) * self.w]
+                self.board[y] = [-1 if v == 0xFF else v for v in row]
+        self.index_regions()
+
+    def place_positions(self, positions):
+        """Place mines at the given linear cell indices, counting only around them.
+
+        Work is proportional to the number of mines: each mine bumps the
+        count of the up to three row slices around it.
+        """
+        w, h = self.w, self.h
+        cells = self.cells if self.compact else bytearray(w * h)
+        for i in positions:
+            cells[i] = 0xFF
+        for i in positions:
+            y, x = divmod(i, w)
+            a, b = max(0, x - 1), min(w, x + 2)
+            for ny in range(max(0, y - 1), min(h, y + 2)):
+                base = ny * w
+                cells[base + a:base + b] = cells[base + a:base + b].translate(INCREMENT)
+        if not self.compact:
+            for y in range(h):
+                self.board[y] = [-1 if v == 0xFF else v for v in cells[y * w:(y + 1) * w]]
+        self.index_regions()
+
+    def start_with(self, mine_map, x, y):
+        """Start a game on a prepared layout by revealing its safe cell (x, y)."""
+        self.place_layout(mine_map)
+        self.started = True
+        self.start_time = time.time()
+        self.cursor_x, self.cursor_y = x, y
+        self.reveal(x, y)
+
+    def index_regions(self):
+        """Label every connected zero region together with its numbered border.
+
+        Zero cells are found as horizontal runs per row and runs touching
+        (8-way) in neighbouring rows are joined with union-find. A region is
+        stored as row spans covering its runs widened by one cell on every
+        side, which is exactly the zero cells plus the cells they border, so
+        revealing it is a handful of slice assignments.
+        """
+        w, h = self.w, self.h
+        cells = self.cells if self.compact else bytes(v & 0xFF for row in self.board for v in row)
+        starts, ends, ids = [], [], []
+        parent = []
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        prev_start = prev_end = prev_ids = ()
+        for y in range(h):
+            base = y * w
+            row_start, row_end, row_ids = [], [], []
+            j = 0
+            for m in ZERO_RUN.finditer(cells, base, base + w):
+                a, b = m.start() - base, m.end() - base
+                rid = len(parent)
+                parent.append(rid)
+                # Runs in the row above touch this one if they overlap [a-1, b].
+                while j < len(prev_start) and prev_end[j] < a:
+                    j += 1
+                k = j
+                while k < len(prev_start) and prev_start[k] <= b:
+                    ra, rb = find(prev_ids[k]), find(rid)
+                    if ra != rb:
+                        parent[rb] = ra
+                    k += 1
+                row_start.append(a)
+                row_end.append(b)
+                row_ids.append(rid)
+            starts.append(row_start)
+            ends.append(row_end)
+            ids.append(row_ids)
+            prev_start, prev_end, prev_ids = row_start, row_end, row_ids
+
+        spans = {}
+        for y in range(h):
+            for a, b, rid in zip(starts[y], ends[y], ids[y]):
+                region = spans.setdefault(find(rid), [])
+                for ny in range(max(0, y - 1), min(h, y + 2)):
+                    region.append((ny, max(0, a - 1), min(w, b + 1)))
+        for root, region in spans.items():
+            region.sort()
+            merged = [region[0]]
+            for span in region[1:]:
+                ny, a, b = merged[-1]
+                if span[0] == ny and span[1] <= b:
+                    merged[-1] = (ny, a, max(b, span[2]))
+                else:
+                    merged.append(span)
+            spans[root] = merged
+        self.run_starts = starts
+        self.run_ids = [[find(rid) for rid in row] for row in ids]
+        self.region_spans = spans
+
+    def zero_region(self, x, y):
+        """Return the precomputed spans of the zero region containing (x, y)."""
+        k = bisect.bisect_right(self.run_starts[y], x) - 1
+        return self.region_spans[self.run_ids[y][k]]
+
+    @tracing.traced
     def flood_reveal(self, x, y):
+        if self.region_spans is None:
+            # Resumed games index their regions on the first reveal.
+            self.index_regions()
+        if self.board[y][x] == 0:
+            spans = self.zero_region(x, y)
+            # A flag inside the region stops the flood there, so only the
+            # unflagged case can be revealed in bulk.
+            if not self.flags or not any(any(self.flagged[ny][a:b]) for ny, a, b in spans):
+                on = b"\x01" if self.compact else [True]
+                opened = 0
+                for ny, a, b in spans:
+                    row = self.revealed[ny]
+                    opened += b - a - bytes(row[a:b]).count(1)
+                    row[a:b] = on * (b - a)
+                self.revealed_count += opened
+                self.hidden_safe -= opened
+                return
+        self.flood_fill(x, y)
+
+    def flood_fill(self, x, y):
         stack = [(x, y)]
         while stack:
             cx, cy = stack.pop()
@@ -69,6 +329,8 @@ class Game:
             if self.revealed[cy][cx] or self.flagged[cy][cx]:
                 continue
             self.revealed[cy][cx] = True
+            self.revealed_count += 1
+            self.hidden_safe -= 1
             if self.board[cy][cx] == 0:
                 for nx, ny in self.neighbors(cx, cy):
                     if not self.revealed[ny][nx]:
@@ -85,6 +347,7 @@ class Game:
 
         if self.board[y][x] == -1:
             self.revealed[y][x] = True
+            self.revealed_count += 1
             self.game_over = True
             self.win = False
             return
@@ -96,102 +359,384 @@ class Game:
         if self.game_over or self.revealed[y][x]:
             return
         self.flagged[y][x] = not self.flagged[y][x]
+        self.flags += 1 if self.flagged[y][x] else -1
 
     def check_win(self):
-        hidden_non_mines = 0
-        for y in range(self.h):
-            for x in range(self.w):
-                if self.board[y][x] != -1 and not self.revealed[y][x]:
-                    hidden_non_mines += 1
-        if hidden_non_mines == 0:
+        if self.hidden_safe == 0:
             self.game_over = True
             self.win = True
 
+    def recount(self):
+        """Recompute (hidden_safe, revealed_count, flags) by scanning the board."""
+        hidden_safe = revealed = flags = 0
+        for y in range(self.h):
+            for x in range(self.w):
+                if self.revealed[y][x]:
+                    revealed += 1
+                elif self.board[y][x] != -1 or not self.started:
+                    hidden_safe += 1
+                if self.flagged[y][x]:
+                    flags += 1
+        if not self.started:
+            hidden_safe -= self.mines
+        return hidden_safe, revealed, flags
+
+    def check_counters(self):
+        """Raise AssertionError if the running counters disagree with the board."""
+        expected = self.recount()
+        actual = (self.hidden_safe, self.revealed_count, self.flags)
+        assert actual == expected, f"counters {actual} != board {expected}"
+
     def elapsed(self):
         if not self.started:
             return 0
         return int(time.time() - self.start_time)
 
 
-def draw(stdscr, g: Game):
-    stdscr.erase()
-    stdscr.addstr(0, 0, "MINESWEEPER")
-    stdscr.addstr(1, 0, f"Grid: {g.w}x{g.h}   Mines: {g.mines}   Time: {g.elapsed()}s")
-    flags_used = sum(1 for row in g.flagged for v in row if v)
-    stdscr.addstr(2, 0, f"Flags: {flags_used}/{g.mines}")
-
-    top = 4
-    left = 2
-
-    stdscr.addstr(top - 1, left, "+" + "--" * g.w + "+")
-    for y in range(g.h):
-        stdscr.addstr(top + y, left, "|")
-        for x in range(g.w):
-            ch = "·"
-            if g.revealed[y][x]:
-                if g.board[y][x] == -1:
-                    ch = "*"
-                elif g.board[y][x] == 0:
-                    ch = " "
-                else:
-                    ch = str(g.board[y][x])
-            elif g.flagged[y][x]:
-                ch = "F"
-            elif g.game_over and not g.win and g.board[y][x] == -1:
-                ch = "*"
-
-            attr = curses.A_NORMAL
-            if x == g.cursor_x and y == g.cursor_y:
-                attr |= curses.A_REVERSE
-            stdscr.addstr(top + y, left + 1 + x * 2, ch + " ", attr)
-
-        stdscr.addstr(top + y, left + 1 + g.w * 2, "|")
-    stdscr.addstr(top + g.h, left, "+" + "--" * g.w + "+")
-
-    stdscr.addstr(top + g.h + 2, 0, "Arrows/WASD move  Space/Enter reveal  F flag  R restart  Q quit")
-
+class View:
+    """Scroll position and layout of the on-screen board window."""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.cols = 0
+        self.rows = 0
+        self.size = None
+        self.minimap = None
+        self.minimap_key = None
+        self.note = ""
+
+
+def cell_char(g, x, y):
+    if g.revealed[y][x]:
+        v = g.board[y][x]
+        if v == -1:
+            return "*"
+        return " " if v == 0 else str(v)
+    if g.flagged[y][x]:
+        return "F"
+    if g.game_over and not g.win and g.board[y][x] == -1:
+        return "*"
+    return "·"
+
+
+def minimap(g):
+    """Explored share of each tile of the board as MINIMAP_W x MINIMAP_H shade glyphs.
+
+    Tall tiles are estimated from at most 16 evenly spaced rows, which keeps
+    the cost from growing with the board height.
+    """
+    tw = -(-g.w // MINIMAP_W)
+    th = -(-g.h // MINIMAP_H)
+    step = max(1, th // 16)
+    tiles = []
+    for ty in range(0, g.h, th):
+        line = ""
+        rows = g.revealed[ty:ty + th:step]
+        for tx in range(0, g.w, tw):
+            x1 = min(g.w, tx + tw)
+            opened = sum(bytes(row[tx:x1]).count(1) for row in rows)
+            line += MINIMAP_SHADES[opened * (len(MINIMAP_SHADES) - 1) // ((x1 - tx) * len(rows))]
+        tiles.append(line)
+    return tw, th, tiles
+
+
+def scroll(view, g):
+    """Move the window the least needed to keep the cursor visible."""
+    if g.cursor_x < view.x:
+        view.x = g.cursor_x
+    elif g.cursor_x >= view.x + view.cols:
+        view.x = g.cursor_x - view.cols + 1
+    if g.cursor_y < view.y:
+        view.y = g.cursor_y
+    elif g.cursor_y >= view.y + view.rows:
+        view.y = g.cursor_y - view.rows + 1
+    view.x = max(0, min(view.x, g.w - view.cols))
+    view.y = max(0, min(view.y, g.h - view.rows))
+
+
+@tracing.traced
+def draw_frame(layer, g, view):
+    """Borders and help text, which only change with the window layout."""
+    rows, cols = view.rows, view.cols
+    layer.addstr(0, 0, "MINESWEEPER")
+    layer.addstr(TOP - 1, LEFT, "+" + "--" * cols + "+")
+    for sy in range(rows):
+        layer.addstr(TOP + sy, LEFT, "|")
+        layer.addstr(TOP + sy, LEFT + 1 + cols * 2, "|")
+    layer.addstr(TOP + rows, LEFT, "+" + "--" * cols + "+")
+    layer.addstr(TOP + rows + 2, 0, "Arrows/WASD move  Space reveal  F flag  H hint  P autoplay  R restart  Q quit")
+    if cols < g.w or rows < g.h:
+        layer.addstr(TOP + rows + 3, 0, "PgUp/PgDn/Home/End move a screen")
+
+
+@tracing.traced
+def draw(screen, g: Game, view=None):
+    # Only the window around the cursor is drawn, so a frame costs the
+    # same on any board size; the screen then sends only changed cells.
+    if view is None:
+        view = View()
+
+    screen.check_size()
+    if (screen.h, screen.w) != view.size:
+        view.size = sh, sw = screen.h, screen.w
+        view.minimap_key = None
+        view.rows = max(1, min(g.h, sh - TOP - 5))
+        fits = LEFT + 3 + 2 * g.w <= sw and view.rows == g.h
+        side = 0 if fits else MINIMAP_W + 3
+        view.cols = max(1, min(g.w, (sw - LEFT - 3 - side) // 2))
+        screen.layers.pop("frame", None)
+    scroll(view, g)
+    rows, cols = view.rows, view.cols
+
+    screen.clear(screen.layer("frame", lambda layer: draw_frame(layer, g, view)))
+    draw_header(screen, g, view)
+    for sy in range(rows):
+        for sx in range(cols):
+            draw_cell(screen, g, view, view.x + sx, view.y + sy)
+
+    if (cols < g.w or rows < g.h) and rows >= MINIMAP_H:
+        key = (g.revealed_count, g.game_over)
+        if key != view.minimap_key:
+            view.minimap = minimap(g)
+            view.minimap_key = key
+        tw, th, tiles = view.minimap
+        mx = LEFT + 4 + cols * 2
+        for ty, line in enumerate(tiles):
+            for tx, ch in enumerate(line):
+                seen = view.x < (tx + 1) * tw and tx * tw < view.x + cols and view.y < (ty + 1) * th and ty * th < view.y + rows
+                screen.addstr(TOP + ty, mx + tx, ch, curses.A_REVERSE if seen else curses.A_NORMAL)
+
+    message = view.note
     if g.game_over:
         if g.win:
-            stdscr.addstr(top + g.h + 4, 0, "You win! Press R to play again.")
+            message = "You win! Press R to play again."
         else:
-            stdscr.addstr(top + g.h + 4, 0, "Boom! You hit a mine. Press R to retry.")
-
-    stdscr.refresh()
-
-
-def run(stdscr):
+            message = "Boom! You hit a mine. Press R to retry."
+    screen.addstr(TOP + rows + 4, 0, message)
+
+    screen.flush()
+
+
+@tracing.traced
+def draw_header(screen, g, view):
+    """Draw the timer and status lines."""
+    rows, cols = view.rows, view.cols
+    screen.clear_to_eol(1)
+    screen.addstr(1, 0, f"Grid: {g.w}x{g.h}   Mines: {g.mines}   Time: {g.elapsed()}s")
+    status = f"Flags: {g.flags}/{g.mines}"
+    if cols < g.w or rows < g.h:
+        status += f"   View: x {view.x}-{view.x + cols - 1}  y {view.y}-{view.y + rows - 1}"
+    screen.clear_to_eol(2)
+    screen.addstr(2, 0, status)
+
+
+@tracing.traced
+def draw_cell(screen, g, view, x, y):
+    """Draw board cell (x, y), which must lie inside the window."""
+    attr = curses.A_NORMAL
+    if x == g.cursor_x and y == g.cursor_y:
+        attr |= curses.A_REVERSE
+    screen.addstr(TOP + y - view.y, LEFT + 1 + (x - view.x) * 2, cell_char(g, x, y) + " ", attr)
+
+
+def frame_key(g, view):
+    """State whose change needs a full frame; cursor moves and flags only touch single cells."""
+    return (g.generation, g.revealed_count, g.started, g.game_over, view.note, view.size, view.x, view.y)
+
+
+def redraw(screen, g, view, before, cursor):
+    """Show g after a key, given frame_key and the cursor from before it.
+
+    A cursor move or flag redraws only the header and the old and new
+    cursor cells; anything else draws a full frame.
+    """
+    scroll(view, g)
+    if frame_key(g, view) != before:
+        draw(screen, g, view)
+        return
+    draw_header(screen, g, view)
+    draw_cell(screen, g, view, *cursor)
+    draw_cell(screen, g, view, g.cursor_x, g.cursor_y)
+    screen.flush()
+
+
+def wait_ms(g, autoplay):
+    """How long getch() may block: until the timer shows a new second, or forever if it is stopped."""
+    if autoplay:
+        return AUTOPLAY_MS
+    if not g.started or g.game_over:
+        return -1
+    return 1000 - int((time.time() - g.start_time) * 1000) % 1000
+
+
+def deal(g, view, pool):
+    """Restart g on a no-guess board from the pool and top the pool up in the background.
+
+    If the pool is empty and none turns up quickly, g is left a normal new
+    game and the note says so.
+    """
+    g.reset()
+    board = pool.take()
+    pool.refill_async()
+    if board is None:
+        view.note = "No no-guess board ready yet: this game may need a guess."
+        return
+    view.note = ""
+    g.start_with(*board)
+
+
+def run(stdscr, w=W, h=H, mines=MINES, no_guess=False, save_path=None):
     curses.curs_set(0)
-    stdscr.nodelay(True)
     stdscr.keypad(True)
 
-    g = Game()
-
-    while True:
-        key = stdscr.getch()
-
-        if key in (ord("q"), ord("Q")):
-            break
-        elif key in (ord("r"), ord("R")):
-            g.reset()
-        elif key in (curses.KEY_LEFT, ord("a"), ord("A")):
-            g.cursor_x = max(0, g.cursor_x - 1)
-        elif key in (curses.KEY_RIGHT, ord("d"), ord("D")):
-            g.cursor_x = min(g.w - 1, g.cursor_x + 1)
-        elif key in (curses.KEY_UP, ord("w"), ord("W")):
-            g.cursor_y = max(0, g.cursor_y - 1)
-        elif key in (curses.KEY_DOWN, ord("s"), ord("S")):
-            g.cursor_y = min(g.h - 1, g.cursor_y + 1)
-        elif key in (ord("f"), ord("F")):
-            g.toggle_flag(g.cursor_x, g.cursor_y)
-        elif key in (ord(" "), 10, 13, curses.KEY_ENTER):
-            g.reveal(g.cursor_x, g.cursor_y)
+    if save_path is not None and os.path.exists(save_path):
+        import mines_save
+
+        g = mines_save.load(save_path)
+    else:
+        g = Game(w, h, mines, compact=w * h > COMPACT_CELLS)
+    view = View()
+    screen = Screen(stdscr)
+    store = gamedb.Store()
+    solver = None
+    autoplay = False
+    pool = None
+    if no_guess:
+        import mines_pool
+
+        pool = mines_pool.BoardPool(g.w, g.h, g.mines)
+        if not g.started:
+            deal(g, view, pool)
+
+    # Input is awaited in a blocking getch() that wakes only for keys, the
+    # next whole second of the timer (header only) or autoplay moves. After
+    # a cursor move or flag only the touched cells are redrawn; anything
+    # else redraws the window, and the screen still sends only changed cells.
+    draw(screen, g, view)
+    try:
+        while True:
+            stdscr.timeout(wait_ms(g, autoplay))
+            key = stdscr.getch()
+            tracing.check_key(key)
+            if key in (ord("q"), ord("Q")):
+                break
+            if key == -1 and not autoplay:
+                draw_header(screen, g, view)
+                screen.flush()
+                continue
 
-        draw(stdscr, g)
-        time.sleep(0.02)
+            before = frame_key(g, view)
+            was_over = g.game_over
+            cursor = (g.cursor_x, g.cursor_y)
+            if key in (ord("p"), ord("P")):
+                autoplay = not autoplay
+            elif pool is not None and key in (ord("r"), ord("R")):
+                deal(g, view, pool)
+            elif key not in (ord("h"), ord("H")):
+                handle_key(g, view, key)
+            if autoplay or key in (ord("h"), ord("H")):
+                if solver is None:
+                    import mines_solver
+
+                    solver = mines_solver.Solver(workers=None if g.compact else 1)
+                autoplay = assist(g, view, solver, autoplay) and autoplay
+
+            if g.game_over and not was_over:
+                record(store, g, no_guess)
+
+            redraw(screen, g, view, before, cursor)
+    finally:
+        if solver is not None:
+            solver.close()
+        if save_path is not None:
+            suspend(g, save_path)
+        store.close()
+
+
+def record(store, g, no_guess):
+    """Queue the finished game g; the score is the safe cells opened, and only a win has a clear time."""
+    mode = f"{g.w}x{g.h}/{g.mines}" + (" no-guess" if no_guess else "")
+    duration = time.time() - g.start_time if g.started else 0.0
+    opened = g.w * g.h - g.mines - g.hidden_safe
+    store.record(gamedb.Session("mines", opened, duration, mode=mode, clear_time=duration if g.win else None))
+
+
+def suspend(g, path):
+    """Save an unfinished game to path, or drop a stale save once it is over."""
+    if g.started and not g.game_over:
+        import mines_save
+
+        mines_save.save(g, path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def assist(g, view, solver, autoplay):
+    """Show or play the solver's next move; return False when autoplay must stop."""
+    if g.game_over:
+        return False
+    move = solver.suggest(g)
+    if move is None:
+        view.note = "Nothing to suggest: every hidden cell left is flagged or a mine."
+        return False
+    x, y, p = move
+    g.cursor_x, g.cursor_y = x, y
+    if g.flagged[y][x]:
+        # Only the first click can land here; reveal() would ignore it.
+        view.note = f"Hint: ({x}, {y}) is flagged; unflag it to go on"
+        return False
+    if p > 0:
+        view.note = f"Hint: ({x}, {y}) is a guess, mine chance {p:.1%}"
+        return False
+    view.note = f"Hint: ({x}, {y}) is safe"
+    if autoplay:
+        g.reveal(x, y)
+    return True
+
+
+def handle_key(g, view, key):
+    if key != -1:
+        view.note = ""
+    if key in (ord("r"), ord("R")):
+        g.reset()
+    elif key in (curses.KEY_LEFT, ord("a"), ord("A")):
+        g.cursor_x = max(0, g.cursor_x - 1)
+    elif key in (curses.KEY_RIGHT, ord("d"), ord("D")):
+        g.cursor_x = min(g.w - 1, g.cursor_x + 1)
+    elif key in (curses.KEY_UP, ord("w"), ord("W")):
+        g.cursor_y = max(0, g.cursor_y - 1)
+    elif key in (curses.KEY_DOWN, ord("s"), ord("S")):
+        g.cursor_y = min(g.h - 1, g.cursor_y + 1)
+    elif key == curses.KEY_PPAGE:
+        g.cursor_y = max(0, g.cursor_y - view.rows)
+    elif key == curses.KEY_NPAGE:
+        g.cursor_y = min(g.h - 1, g.cursor_y + view.rows)
+    elif key == curses.KEY_HOME:
+        g.cursor_x = max(0, g.cursor_x - view.cols)
+    elif key == curses.KEY_END:
+        g.cursor_x = min(g.w - 1, g.cursor_x + view.cols)
+    elif key == curses.KEY_RESIZE:
+        view.size = None
+    elif key in (ord("f"), ord("F")):
+        g.toggle_flag(g.cursor_x, g.cursor_y)
+    elif key in (ord(" "), 10, 13, curses.KEY_ENTER):
+        g.reveal(g.cursor_x, g.cursor_y)
 
 
 def main():
-    curses.wrapper(run)
+    parser = argparse.ArgumentParser(description="Terminal Minesweeper")
+    parser.add_argument("--width", type=int, default=W)
+    parser.add_argument("--height", type=int, default=H)
+    parser.add_argument("--mines", type=int, default=MINES)
+    parser.add_argument("--no-guess", action="store_true", help="only deal boards solvable without guessing")
+    parser.add_argument("--save", metavar="FILE", help="resume from and save to FILE")
+    args = parser.parse_args()
+    if not 0 <= args.mines < args.width * args.height:
+        parser.error("--mines must be less than the number of cells")
+    if args.no_guess and args.mines > args.width * args.height - 9:
+        parser.error("--no-guess needs room for a 3x3 opening")
+    curses.wrapper(run, args.width, args.height, args.mines, args.no_guess, args.save)
 
 
 if __name__ == "__main__":
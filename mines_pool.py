@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+No-guess Minesweeper boards and a persistent pool of pre-generated ones.
+
+A board is accepted when the solver, starting from its safe opening cell,
+can clear it by deduction alone. Finding one can take many candidate
+layouts, so generation runs on a process pool and accepted boards are kept
+on disk, one file per size and mine count, to be popped instantly when a
+game starts. A background thread tops the pool up again.
+
+Usage:
+  python mines_pool.py fill [--width W] [--height H] [--mines N] [--count C] [-j WORKERS]
+  python mines_pool.py stats
+"""
+
+import argparse
+import fcntl
+import os
+import random
+import re
+import struct
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import mines
+import mines_solver
+
+POOL_DIR = os.environ.get("MINES_POOL_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mines-pool"))
+POOL_TARGET = 20
+# Candidate layouts one worker tries per job before reporting back.
+TRIES_PER_JOB = 25
+START = struct.Struct("<HH")
+POOL_NAME = re.compile(r"(\d+)x(\d+)-(\d+)\.pool")
+
+
+def pack(mine_map):
+    return bytes(sum(mine_map[i + j] << j for j in range(min(8, len(mine_map) - i))) for i in range(0, len(mine_map), 8))
+
+
+def unpack(data, n):
+    return bytes((data[i >> 3] >> (i & 7)) & 1 for i in range(n))
+
+
+def candidate(w, h, mines_count, rng):
+    """Return (mine_map, x, y): a random layout whose start cell (x, y) is an opening."""
+    x, y = rng.randrange(w), rng.randrange(h)
+    opening = {(y + dy) * w + x + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1) if 0 <= x + dx < w and 0 <= y + dy < h}
+    mine_map = bytearray(w * h)
+    for i in mines.sample_mines(w * h, mines_count, opening, rng):
+        mine_map[i] = 1
+    return bytes(mine_map), x, y
+
+
+def solvable(w, h, mines_count, mine_map, x, y, solver=None):
+    """True if the layout can be cleared from (x, y) without guessing."""
+    solver = solver or mines_solver.Solver()
+    g = mines.Game(w, h, mines_count)
+    g.start_with(mine_map, x, y)
+    while not g.game_over:
+        safe = solver.analyze(g).safe
+        if not safe:
+            return False
+        for sx, sy in safe:
+            g.reveal(sx, sy)
+    return g.win
+
+
+def generate(args):
+    """Try up to TRIES_PER_JOB layouts; return (mine_map, x, y) for the first no-guess one or None."""
+    w, h, mines_count, seed = args
+    rng = random.Random(seed)
+    solver = mines_solver.Solver()
+    for _ in range(TRIES_PER_JOB):
+        mine_map, x, y = candidate(w, h, mines_count, rng)
+        if solvable(w, h, mines_count, mine_map, x, y, solver):
+            return mine_map, x, y
+    return None
+
+
+def generate_many(w, h, mines_count, count, workers=None, executor=None):
+    """Yield `count` no-guess boards, searching on a process pool."""
+    own = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=workers)
+    jobs = (os.cpu_count() or 1) * 2
+    try:
+        found = 0
+        while found < count:
+            seeds = [(w, h, mines_count, random.getrandbits(64)) for _ in range(jobs)]
+            for board in executor.map(generate, seeds):
+                if board is not None and found < count:
+                    found += 1
+                    yield board
+    finally:
+        if own:
+            executor.shutdown(cancel_futures=True)
+
+
+class BoardPool:
+    """Fixed-size records of accepted boards in one file per (w, h, mines).
+
+    A record is the start cell followed by the mine map packed 8 cells per
+    byte. Boards are appended at the end and popped from the end by
+    truncating the file, under an flock so several games can share a pool.
+    """
+
+    def __init__(self, w, h, mines_count, directory=POOL_DIR):
+        self.w, self.h, self.mines = w, h, mines_count
+        self.record = START.size + (w * h + 7) // 8
+        self.path = os.path.join(directory, f"{w}x{h}-{mines_count}.pool")
+        self.refiller = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+b")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // self.record
+        except OSError:
+            return 0
+
+    def push(self, board):
+        mine_map, x, y = board
+        with self._open() as f:
+            f.write(START.pack(x, y) + pack(mine_map))
+
+    def pop(self):
+        """Return (mine_map, x, y) for a stored board, or None if the pool is empty."""
+        with self._open() as f:
+            size = f.seek(0, os.SEEK_END) // self.record * self.record
+            if not size:
+                return None
+            f.seek(size - self.record)
+            data = f.read(self.record)
+            f.truncate(size - self.record)
+        x, y = START.unpack_from(data)
+        return unpack(data[START.size:], self.w * self.h), x, y
+
+    def fill(self, target=POOL_TARGET, workers=None):
+        missing = target - len(self)
+        if missing > 0:
+            for board in generate_many(self.w, self.h, self.mines, missing, workers):
+                self.push(board)
+
+    def refill_async(self, target=POOL_TARGET, workers=None):
+        """Top the pool up to target on a daemon thread unless one is already running."""
+        if self.refiller is not None and self.refiller.is_alive():
+            return
+        if len(self) >= target:
+            return
+        self.refiller = threading.Thread(target=self._refill, args=(target, workers), daemon=True)
+        self.refiller.start()
+
+    def _refill(self, target, workers):
+        try:
+            self.fill(target, workers)
+        except RuntimeError:
+            # The interpreter is exiting and the executor refuses new work.
+            pass
+
+    def take(self):
+        """Pop a board, or try TRIES_PER_JOB layouts in the foreground if the pool is empty.
+
+        Returns None when none of those is no-guess, so the caller can
+        start a normal game instead of stalling.
+        """
+        board = self.pop()
+        if board is None:
+            board = generate((self.w, self.h, self.mines, random.getrandbits(64)))
+        return board
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the no-guess Minesweeper board pool.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("fill", help="generate boards until the pool holds --count")
+    fill.add_argument("--width", type=int, default=mines.W)
+    fill.add_argument("--height", type=int, default=mines.H)
+    fill.add_argument("--mines", type=int, default=mines.MINES)
+    fill.add_argument("--count", type=int, default=POOL_TARGET)
+    fill.add_argument("-j", "--workers", type=int, default=None)
+    sub.add_parser("stats", help="list stored pools")
+    args = parser.parse_args()
+
+    if args.command == "fill":
+        pool = BoardPool(args.width, args.height, args.mines)
+        pool.fill(args.count, args.workers)
+        print(f"{pool.path}: {len(pool)} boards")
+    else:
+        names = sorted(os.listdir(POOL_DIR)) if os.path.isdir(POOL_DIR) else []
+        for name in names:
+            match = POOL_NAME.fullmatch(name)
+            if match:
+                w, h, m = map(int, match.groups())
+                print(f"{name}: {len(BoardPool(w, h, m, POOL_DIR))} boards")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Minesweeper save files: one packed byte per cell.
+
+Each cell byte holds the neighbour count in its low nibble (MINE for a
+mine), the revealed flag in bit 4 and the flag marker in bit 5, so a file
+is a small header followed by exactly w * h bytes. Packing the three
+board planes is a few big-int operations over byte lanes and unpacking is
+one bytes.translate per plane, so even very large games save and resume
+in well under a second and never need more than a few bytes per cell.
+"""
+
+import os
+import struct
+import time
+
+import mines
+
+MAGIC = b"MSAV"
+VERSION = 1
+# magic, version, width, height, mines, cursor x, cursor y, elapsed, started, game over, win
+HEADER = struct.Struct("<4sBIIIIId???")
+
+MINE = 0x0F
+REVEALED = 0x10
+FLAGGED = 0x20
+
+COUNT_PLANE = bytes(0xFF if b & 0x0F == MINE else b & 0x0F for b in range(256))
+REVEALED_PLANE = bytes(int(bool(b & REVEALED)) for b in range(256))
+FLAGGED_PLANE = bytes(int(bool(b & FLAGGED)) for b in range(256))
+
+
+def planes(g):
+    """Return the (board, revealed, flagged) planes of g as flat one-byte-per-cell buffers."""
+    if g.compact:
+        return g.cells, g.revealed_cells, g.flagged_cells
+    board = bytes(v & 0xFF for row in g.board for v in row)
+    revealed = bytes(1 if v else 0 for row in g.revealed for v in row)
+    flagged = bytes(1 if v else 0 for row in g.flagged for v in row)
+    return board, revealed, flagged
+
+
+def pack(g):
+    """Return the packed cell bytes of g."""
+    board, revealed, flagged = planes(g)
+    n = len(board)
+    low = int.from_bytes(b"\x0f" * n, "little")
+    packed = (
+        (int.from_bytes(board, "little") & low)
+        | (int.from_bytes(revealed, "little") << 4)
+        | (int.from_bytes(flagged, "little") << 5)
+    )
+    return packed.to_bytes(n, "little")
+
+
+def save(g, path):
+    """Write g to path, replacing any previous save atomically."""
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        g.w,
+        g.h,
+        g.mines,
+        g.cursor_x,
+        g.cursor_y,
+        g.elapsed(),
+        g.started,
+        g.game_over,
+        g.win,
+    )
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(pack(g))
+    os.replace(tmp, path)
+
+
+def load(path):
+    """Return the Game saved at path, ready to continue."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError("truncated Minesweeper save header")
+    magic, version, w, h, mine_count, cx, cy, elapsed, started, game_over, win = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a Minesweeper save")
+    if len(data) != HEADER.size + w * h:
+        raise ValueError("save length does not match its board size")
+    cells = data[HEADER.size:]
+
+    g = mines.Game(w, h, mine_count, compact=w * h > mines.COMPACT_CELLS)
+    board = cells.translate(COUNT_PLANE)
+    revealed = cells.translate(REVEALED_PLANE)
+    flagged = cells.translate(FLAGGED_PLANE)
+    if g.compact:
+        g.cells[:] = board
+        g.revealed_cells[:] = revealed
+        g.flagged_cells[:] = flagged
+    else:
+        for y in range(h):
+            row = slice(y * w, (y + 1) * w)
+            g.board[y] = [-1 if v == 0xFF else v for v in board[row]]
+            g.revealed[y] = [bool(v) for v in revealed[row]]
+            g.flagged[y] = [bool(v) for v in flagged[row]]
+
+    g.cursor_x, g.cursor_y = cx, cy
+    g.started, g.game_over, g.win = started, game_over, win
+    g.start_time = time.time() - elapsed
+    g.revealed_count = revealed.count(1)
+    g.flags = flagged.count(1)
+    if started:
+        g.hidden_safe = w * h - mine_count - (g.revealed_count - cells.count(MINE | REVEALED))
+    return g
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Minesweeper solver: safe cells, known mines and mine probabilities.
+
+The solver only looks at what a player can see in a mines.Game: revealed
+numbers and which cells are still hidden. Every revealed number next to a
+hidden cell is a constraint "these hidden cells hold n mines". The
+constraints go through a pipeline:
+
+  1. trivial deductions (n == 0 or n == number of cells) and subset
+     reductions (A inside B gives B - A with n_B - n_A mines), repeated
+     until nothing changes;
+  2. the remaining constraints are split into independent connected
+     components;
+  3. each component is enumerated exactly by backtracking, giving the
+     number of layouts per mine count and per cell. Results are memoized
+     by the component's shape, and uncached components can be enumerated
+     in parallel on a process pool;
+  4. components are combined through the global mine count, giving exact
+     probabilities for frontier cells and for the unconstrained rest.
+"""
+
+import math
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from mines import neighbor_counts
+
+NONZERO = bytes([0] + [1] * 255)
+HIDDEN = bytes([1] + [0] * 255)
+ONE = re.compile(b"\x01")
+
+# Convolved distributions drop tails below this share of their peak; they
+# cannot move a probability by a representable amount.
+TRIM = 1e-18
+# Components smaller than this are not worth shipping to another process.
+PARALLEL_MIN_CELLS = 12
+CACHE_SIZE = 4096
+# Hints look this far around the cursor first and only analyse boards up to
+# FULL_ANALYSIS_CELLS as a whole.
+HINT_RADIUS = 40
+FULL_ANALYSIS_CELLS = 250_000
+
+
+@dataclass
+class Analysis:
+    safe: set = field(default_factory=set)
+    mines: set = field(default_factory=set)
+    probabilities: dict = field(default_factory=dict)  # (x, y) -> P(mine) on the frontier
+    outside: float = None  # P(mine) for a hidden cell with no revealed neighbour
+    hidden: int = 0
+
+
+def flat_state(g, box):
+    """Return (board, revealed) for box = (x0, y0, x1, y1) as one byte per cell.
+
+    Board values are zeroed where the cell is not revealed, so nothing the
+    player cannot see leaks into the solver.
+    """
+    x0, y0, x1, y1 = box
+    if g.compact:
+        w = g.w
+        board = b"".join(g.cells[y * w + x0:y * w + x1] for y in range(y0, y1))
+        revealed = b"".join(g.revealed_cells[y * w + x0:y * w + x1] for y in range(y0, y1))
+    else:
+        board = bytes(v & 0xFF for row in g.board[y0:y1] for v in row[x0:x1])
+        revealed = bytes(1 if v else 0 for row in g.revealed[y0:y1] for v in row[x0:x1])
+    shown = int.from_bytes(revealed, "little") * 0xFF
+    board = (int.from_bytes(board, "little") & shown).to_bytes(len(revealed), "little")
+    return board, revealed
+
+
+def constraints(g, box=None):
+    """Return the frontier constraints {(cells, n)} with cells as linear board indices.
+
+    With box = (x0, y0, x1, y1) only numbers inside the box are used.
+    """
+    if box is None:
+        box = (0, 0, g.w, g.h)
+    x0, y0, x1, y1 = box
+    # Read one extra ring so numbers on the box edge see all their neighbours.
+    ex0, ey0, ex1, ey1 = max(0, x0 - 1), max(0, y0 - 1), min(g.w, x1 + 1), min(g.h, y1 + 1)
+    w, h = ex1 - ex0, ey1 - ey0
+    board, revealed = flat_state(g, (ex0, ey0, ex1, ey1))
+    hidden = revealed.translate(HIDDEN)
+    # Revealed numbers with at least one hidden neighbour, as 0/1 lanes.
+    near_hidden = int.from_bytes(neighbor_counts(hidden, w, h).translate(NONZERO), "little")
+    numbered = int.from_bytes(board.translate(NONZERO), "little")
+    shown = int.from_bytes(revealed, "little")
+    edge = (near_hidden & numbered & shown).to_bytes(w * h, "little")
+
+    result = set()
+    for m in ONE.finditer(edge):
+        i = m.start()
+        x, y = i % w, i // w
+        if not (x0 <= ex0 + x < x1 and y0 <= ey0 + y < y1):
+            continue
+        cells = []
+        for ny in range(max(0, y - 1), min(h, y + 2)):
+            for nx in range(max(0, x - 1), min(w, x + 2)):
+                if hidden[ny * w + nx]:
+                    cells.append((ey0 + ny) * g.w + ex0 + nx)
+        result.add((frozenset(cells), board[i]))
+    return result
+
+
+def reduce(cons):
+    """Apply trivial and subset deductions; return (known {cell: 0|1}, remaining constraints)."""
+    known = {}
+    cons = set(cons)
+    while True:
+        # Trivial deductions, re-checking only constraints touched by new facts.
+        by_cell = defaultdict(set)
+        for con in cons:
+            for c in con[0]:
+                by_cell[c].add(con)
+        todo = list(cons)
+        while todo:
+            con = todo.pop()
+            if con not in cons:
+                continue
+            cells, n = con
+            if not (n == 0 or n == len(cells)):
+                continue
+            cons.discard(con)
+            for c in cells:
+                if c in known:
+                    continue
+                known[c] = 1 if n else 0
+                for other in list(by_cell.pop(c, ())):
+                    if other not in cons:
+                        continue
+                    cons.discard(other)
+                    o_cells, o_n = other
+                    rest = (o_cells - {c}, o_n - known[c])
+                    for d in other[0]:
+                        by_cell[d].discard(other)
+                    if rest[0]:
+                        cons.add(rest)
+                        for d in rest[0]:
+                            by_cell[d].add(rest)
+                        todo.append(rest)
+
+        derived = set()
+        for a, na in cons:
+            # Any superset of a contains every cell of a; check the rarest one.
+            pivot = min(a, key=lambda c: len(by_cell[c]))
+            for b, nb in by_cell[pivot]:
+                if len(b) > len(a) and a < b:
+                    derived.add((b - a, nb - na))
+        derived -= cons
+        if not derived:
+            return known, cons
+        cons |= derived
+
+
+def components(cons):
+    """Split constraints into groups that share no cells."""
+    parent = {}
+
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    for cells, _ in cons:
+        it = iter(cells)
+        first = next(it)
+        parent.setdefault(first, first)
+        for c in it:
+            parent.setdefault(c, c)
+            ra, rb = find(first), find(c)
+            if ra != rb:
+                parent[rb] = ra
+    groups = defaultdict(list)
+    for con in cons:
+        groups[find(next(iter(con[0])))].append(con)
+    return list(groups.values())
+
+
+def canonical(group):
+    """Relabel a component's cells 0..k-1 in index order; return (cells, key)."""
+    cells = sorted({c for con in group for c in con[0]})
+    local = {c: i for i, c in enumerate(cells)}
+    key = tuple(sorted((tuple(sorted(local[c] for c in con_cells)), n) for con_cells, n in group))
+    return cells, key
+
+
+def enumerate_component(key):
+    """Count the layouts of one canonical component exactly.
+
+    Returns (counts, hits): counts[k] is the number of layouts with k mines
+    and hits[k][i] the number of those with a mine on cell i.
+
+    Cells are assigned in index order. Between cell i-1 and cell i the only
+    thing that matters for the rest is how many mines each constraint that
+    is still open still needs, so layouts are counted per such state
+    (memoized backtracking) rather than one by one. A forward pass counts
+    the ways to reach each state, a backward pass the ways to finish from
+    it, and their product gives the per-cell counts.
+    """
+    size = 1 + max(c for cells, _ in key for c in cells)
+    cons_of = [[] for _ in range(size)]
+    first, last = [], []
+    for ci, (cells, _) in enumerate(key):
+        for c in cells:
+            cons_of[c].append(ci)
+        first.append(min(cells))
+        last.append(max(cells))
+    # after[ci][i]: cells of constraint ci with an index above i.
+    after = [{c: sum(1 for d in cells if d > c) for c in cells} for cells, _ in key]
+    # open_at[i]: constraints started before cell i and not finished by it.
+    open_at = [[ci for ci in range(len(key)) if first[ci] < i <= last[ci]] for i in range(size + 1)]
+
+    def step(i, state, v):
+        needs = dict(zip(open_at[i], state))
+        for ci in cons_of[i]:
+            need = needs.get(ci, key[ci][1]) - v
+            if need < 0 or need > after[ci][i]:
+                return None
+            needs[ci] = need
+        return tuple(needs[ci] for ci in open_at[i + 1])
+
+    forward = [{(): {0: 1}}]
+    for i in range(size):
+        layer = defaultdict(lambda: defaultdict(int))
+        for state, ks in forward[i].items():
+            for v in (0, 1):
+                nxt = step(i, state, v)
+                if nxt is not None:
+                    for k, n in ks.items():
+                        layer[nxt][k + v] += n
+        forward.append(layer)
+
+    backward = [None] * (size + 1)
+    backward[size] = {(): {0: 1}}
+    hits = defaultdict(lambda: [0] * size)
+    for i in range(size - 1, -1, -1):
+        layer = {}
+        for state, ks in forward[i].items():
+            done = defaultdict(int)
+            for v in (0, 1):
+                nxt = step(i, state, v)
+                rest = backward[i + 1].get(nxt) if nxt is not None else None
+                if not rest:
+                    continue
+                for k2, n2 in rest.items():
+                    done[k2 + v] += n2
+                if v:
+                    for k1, n1 in ks.items():
+                        for k2, n2 in rest.items():
+                            hits[k1 + k2 + 1][i] += n1 * n2
+            if done:
+                layer[state] = dict(done)
+        backward[i] = layer
+
+    counts = backward[0].get((), {})
+    return dict(counts), {k: hits[k] for k in counts}
+
+
+def trim(offset, dist):
+    peak = max(dist)
+    cut = peak * TRIM
+    lo = 0
+    while dist[lo] < cut:
+        lo += 1
+    hi = len(dist)
+    while dist[hi - 1] < cut:
+        hi -= 1
+    return offset + lo, [v / peak for v in dist[lo:hi]]
+
+
+def convolve(a, b):
+    (oa, da), (ob, db) = a, b
+    out = [0.0] * (len(da) + len(db) - 1)
+    for i, x in enumerate(da):
+        if x:
+            for j, y in enumerate(db):
+                out[i + j] += x * y
+    return trim(oa + ob, out)
+
+
+def exclusive(dists):
+    """For each distribution, the convolution of all the others.
+
+    Products of every node of a balanced tree over the list are built once
+    bottom-up; each leaf then gets the product of its siblings' subtrees on
+    the way down, so only O(n) convolutions are needed.
+    """
+    tree = {}
+
+    def build(lo, hi):
+        if hi - lo == 1:
+            tree[lo, hi] = dists[lo]
+        else:
+            mid = (lo + hi) // 2
+            tree[lo, hi] = convolve(build(lo, mid), build(mid, hi))
+        return tree[lo, hi]
+
+    out = [None] * len(dists)
+
+    def down(lo, hi, outside):
+        if hi - lo == 1:
+            out[lo] = outside
+            return
+        mid = (lo + hi) // 2
+        down(lo, mid, convolve(outside, tree[mid, hi]))
+        down(mid, hi, convolve(outside, tree[lo, mid]))
+
+    build(0, len(dists))
+    down(0, len(dists), (0, [1.0]))
+    return out
+
+
+class Solver:
+    """Analyses games, reusing component solutions and an optional process pool."""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.pool = None
+        self.cache = {}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def solve(self, keys):
+        todo = [k for k in dict.fromkeys(keys) if k not in self.cache]
+        big = [k for k in todo if 1 + max(c for cells, _ in k for c in cells) >= PARALLEL_MIN_CELLS]
+        if self.workers != 1 and len(big) > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            for k, sol in zip(big, self.pool.map(enumerate_component, big)):
+                self.cache[k] = sol
+        for k in todo:
+            if k not in self.cache:
+                self.cache[k] = enumerate_component(k)
+        if len(self.cache) > CACHE_SIZE:
+            keep = set(keys)
+            self.cache = {k: v for k, v in self.cache.items() if k in keep}
+        return [self.cache[k] for k in keys]
+
+    def analyze(self, g, box=None):
+        """Analyse the whole board, or only the numbers inside box = (x0, y0, x1, y1).
+
+        Safe cells and mines found inside a box are certain. Its
+        probabilities treat everything outside the box as unconstrained, so
+        they are estimates.
+        """
+        w = g.w
+        hidden = g.w * g.h - g.revealed_count
+        if not g.started:
+            # The first click is always safe and nothing else is known.
+            return Analysis(outside=g.mines / max(1, g.w * g.h - 1), hidden=hidden)
+
+        cons = constraints(g, box)
+        known, cons = reduce(cons)
+        groups = [canonical(group) for group in components(cons)]
+        solutions = self.solve([key for _, key in groups])
+
+        constrained = sum(len(cells) for cells, _ in groups)
+        free = hidden - constrained - len(known)
+        left = g.mines - sum(known.values())
+
+        dists = []
+        for counts, _ in solutions:
+            lo, hi = min(counts), max(counts)
+            peak = max(counts.values())
+            dists.append((lo, [counts.get(k, 0) / peak for k in range(lo, hi + 1)]))
+
+        # logs[t]: log of the number of free-cell layouts when the components
+        # hold t mines. These span hundreds of orders of magnitude on big
+        # boards, so everything they touch is combined in log space.
+        lg = math.lgamma
+        logs = []
+        for t in range(sum(len(cells) for cells, _ in groups) + 1):
+            r = left - t
+            logs.append(lg(free + 1) - lg(r + 1) - lg(free - r + 1) if 0 <= r <= free else None)
+
+        def log_weighted(offset, dist):
+            """log of sum_s dist[s] * layouts(offset + s), or None if impossible."""
+            terms = [(d, logs[offset + i]) for i, d in enumerate(dist) if d and logs[offset + i] is not None]
+            if not terms:
+                return None
+            top = max(lw for _, lw in terms)
+            return top + math.log(sum(d * math.exp(lw - top) for d, lw in terms))
+
+        result = Analysis(hidden=hidden)
+        for c, v in known.items():
+            (result.mines if v else result.safe).add((c % w, c // w))
+            result.probabilities[(c % w, c // w)] = float(v)
+
+        others = exclusive(dists) if dists else []
+        for (cells, _), (counts, hits), (o_off, o_dist) in zip(groups, solutions, others):
+            # P(component holds k) ∝ layouts(k) * sum_s others(s) * free layouts(k + s)
+            logk = {}
+            for k, n in counts.items():
+                lw = log_weighted(o_off + k, o_dist)
+                if lw is not None:
+                    logk[k] = math.log(n) + lw
+            top = max(logk.values(), default=0.0)
+            pk = {k: math.exp(v - top) for k, v in logk.items()}
+            total = sum(pk.values())
+            for i, c in enumerate(cells):
+                p = sum(pk[k] * hits[k][i] / counts[k] for k in pk) / total if total else 0.0
+                xy = (c % w, c // w)
+                result.probabilities[xy] = p
+                if p == 0.0:
+                    result.safe.add(xy)
+                elif p == 1.0:
+                    result.mines.add(xy)
+
+        if free:
+            t_off, t_dist = convolve(others[0], dists[0]) if dists else (0, [1.0])
+            logt = [(t_off + i, math.log(d) + logs[t_off + i]) for i, d in enumerate(t_dist) if d and logs[t_off + i] is not None]
+            top = max((v for _, v in logt), default=0.0)
+            pt = [(t, math.exp(v - top)) for t, v in logt]
+            norm = sum(p for _, p in pt)
+            result.outside = sum(p * (left - t) for t, p in pt) / (norm * free) if norm else 0.0
+        return result
+
+    def suggest(self, g):
+        """Return (x, y, p) for the next cell to reveal, or None.
+
+        Numbers around the cursor are tried first, since a safe cell found
+        there is certain; the whole board is only analysed when that finds
+        nothing and the board is small enough to stay interactive.
+        """
+        r = HINT_RADIUS
+        box = (max(0, g.cursor_x - r), max(0, g.cursor_y - r), min(g.w, g.cursor_x + r + 1), min(g.h, g.cursor_y + r + 1))
+        full = box == (0, 0, g.w, g.h)
+        analysis = self.analyze(g, None if full else box)
+        if not analysis.safe and not full and g.w * g.h <= FULL_ANALYSIS_CELLS:
+            analysis = self.analyze(g)
+        return hint(g, analysis)
+
+
+def hint(g, analysis):
+    """Return (x, y, p): the hidden cell to reveal next and its mine probability.
+
+    Known safe cells come first (the one nearest the cursor), otherwise the
+    least likely mine, preferring frontier cells on ties. Flagged cells and
+    certain mines are never suggested; reveal() ignores the former.
+    """
+    cx, cy = g.cursor_x, g.cursor_y
+    if not g.started:
+        return cx, cy, 0.0
+    safe = [(x, y) for x, y in analysis.safe if not g.flagged[y][x]]
+    if safe:
+        x, y = min(safe, key=lambda c: abs(c[0] - cx) + abs(c[1] - cy))
+        return x, y, 0.0
+    best = None
+    candidates = [(xy, p) for xy, p in analysis.probabilities.items() if p < 1 and not g.flagged[xy[1]][xy[0]]]
+    if candidates:
+        best = min(candidates, key=lambda kv: (kv[1], abs(kv[0][0] - cx) + abs(kv[0][1] - cy)))
+    if analysis.outside is not None and analysis.outside < 1 and (best is None or analysis.outside < best[1]):
+        cell = free_cell(g, analysis)
+        if cell is not None:
+            return cell[0], cell[1], analysis.outside
+    if best is None:
+        return None
+    (x, y), p = best
+    return x, y, p
+
+
+def free_cell(g, analysis):
+    """Find an unflagged hidden cell off the frontier, searching outward from the cursor."""
+    cx, cy = g.cursor_x, g.cursor_y
+    for r in range(max(g.w, g.h)):
+        ring = [(cx + d, cy - r) for d in range(-r, r + 1)] + [(cx + d, cy + r) for d in range(-r, r + 1)]
+        ring += [(cx - r, cy + d) for d in range(-r + 1, r)] + [(cx + r, cy + d) for d in range(-r + 1, r)]
+        for x, y in ring:
+            if (
+                0 <= x < g.w
+                and 0 <= y < g.h
+                and not g.revealed[y][x]
+                and not g.flagged[y][x]
+                and (x, y) not in analysis.probabilities
+            ):
+                return x, y
+    return None
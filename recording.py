@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Gameplay recordings: captured from the screen buffer, written off-thread.
+
+With RECORD=FILE set, every Screen (see screenbuf) hands the spans each
+flush() wrote to a process-wide Recorder. On the game thread that is one
+deque append per frame that changed anything. A writer thread drains
+the deque, keeps its own copy of the terminal and writes the spans as a
+delta stream:
+
+  file  = "TREC" | version u8 | header length u32 | header JSON | block*
+  block = start time f64 | frame count u32 | zlib length u32 | zlib(frame*)
+  frame = time f64 | flags u8 | height u16 | width u16 | span count u32 | span*
+  span  = y u16 | x u16 | attr u32 | text length u16 | utf-8 text
+
+Each block opens with a keyframe holding the whole screen, so playback
+can seek by reading block headers only and decoding the one block that
+holds the target time. The header JSON has the color pairs in use, for
+turning attributes back into terminal colors.
+
+Usage:
+  python recording.py play FILE [--seek SECONDS] [--speed X]
+  python recording.py export FILE OUT.cast
+  python recording.py info FILE
+"""
+
+import argparse
+import atexit
+import collections
+import curses
+import itertools
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+MAGIC = b"TREC"
+VERSION = 1
+PREFIX = struct.Struct("<4sBI")
+BLOCK = struct.Struct("<dII")
+FRAME = struct.Struct("<dBHHI")
+SPAN = struct.Struct("<HHIH")
+
+# Frame flags: CLEAR blanks the screen first (and takes the frame's size),
+# KEY marks a keyframe, which repeats the screen instead of changing it.
+CLEAR = 1
+KEY = 2
+
+# A new block, and so a keyframe, starts after this many seconds or frames.
+KEYFRAME_SECONDS = 5.0
+KEYFRAME_FRAMES = 300
+# Color pairs looked up for the header; the games use a handful.
+MAX_PAIRS = 64
+
+
+def color_pairs():
+    """Return {pair: (fg, bg)} for the initialized color pairs, empty without a terminal."""
+    pairs = {}
+    try:
+        for n in range(1, min(getattr(curses, "COLOR_PAIRS", 0), MAX_PAIRS)):
+            fg, bg = curses.pair_content(n)
+            if (fg, bg) != (0, 0):
+                pairs[n] = (fg, bg)
+    except curses.error:
+        pass
+    return pairs
+
+
+class Terminal:
+    """The characters and attributes a recording shows at one point in time."""
+
+    def __init__(self, h=0, w=0):
+        self.resize(h, w)
+
+    def resize(self, h, w):
+        self.h = h
+        self.w = w
+        self.chars = [[" "] * w for _ in range(h)]
+        self.attrs = [[curses.A_NORMAL] * w for _ in range(h)]
+
+    def apply(self, flags, h, w, spans):
+        if flags & CLEAR or (h, w) != (self.h, self.w):
+            self.resize(h, w)
+        for y, x, text, attr in spans:
+            if 0 <= y < self.h:
+                text = text[:self.w - x]
+                self.chars[y][x:x + len(text)] = text
+                self.attrs[y][x:x + len(text)] = [attr] * len(text)
+
+    def spans(self):
+        """Return the whole screen as runs of equal attribute."""
+        out = []
+        for y in range(self.h):
+            chars, attrs = self.chars[y], self.attrs[y]
+            start = 0
+            for x in range(1, self.w + 1):
+                if x == self.w or attrs[x] != attrs[start]:
+                    out.append((y, start, "".join(chars[start:x]), attrs[start]))
+                    start = x
+        return out
+
+
+def encode_frame(t, flags, h, w, spans):
+    parts = [FRAME.pack(t, flags, h, w, len(spans))]
+    for y, x, text, attr in spans:
+        data = text.encode()
+        parts.append(SPAN.pack(y, x, attr, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_frames(data):
+    """Yield (time, flags, height, width, spans) for each frame in a decompressed block."""
+    offset = 0
+    while offset < len(data):
+        t, flags, h, w, count = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        spans = []
+        for _ in range(count):
+            y, x, attr, n = SPAN.unpack_from(data, offset)
+            offset += SPAN.size
+            spans.append((y, x, data[offset:offset + n].decode(), attr))
+            offset += n
+        yield t, flags, h, w, spans
+
+
+class Recorder:
+    """Queue of flushed frames and the thread that writes them to path."""
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = collections.deque()
+        self.start = None
+        self.stopping = False
+        self.failed = False
+        # Set when there is something to write, so an idle writer sleeps.
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def frame(self, clear, h, w, spans):
+        """Queue one flushed frame; called on the game thread, so it only appends."""
+        if self.failed:
+            return
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+            self.pending.append(color_pairs())
+        self.pending.append((now - self.start, clear, h, w, spans))
+        self.wake.set()
+
+    def _write(self):
+        f = None
+        term = Terminal()
+        block = []
+        block_start = 0.0
+        try:
+            while True:
+                self.wake.wait()
+                self.wake.clear()
+                # Read before draining: once close() has set it, nothing more is queued.
+                stopping = self.stopping
+                while self.pending:
+                    item = self.pending.popleft()
+                    if isinstance(item, dict):
+                        header = json.dumps({"version": VERSION, "pairs": item, "started": time.time()}).encode()
+                        f = open(self.path, "wb")
+                        f.write(PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+                        continue
+                    t, clear, h, w, spans = item
+                    if block and (len(block) >= KEYFRAME_FRAMES or t - block_start >= KEYFRAME_SECONDS):
+                        self._write_block(f, block_start, block)
+                        block = []
+                    if not block:
+                        block_start = t
+                        block.append(encode_frame(t, KEY | CLEAR, term.h, term.w, term.spans()))
+                    flags = CLEAR if clear else 0
+                    term.apply(flags, h, w, spans)
+                    block.append(encode_frame(t, flags, h, w, spans))
+                if stopping:
+                    break
+            if block:
+                self._write_block(f, block_start, block)
+        except OSError:
+            # Stop queueing rather than let frames pile up unwritten.
+            self.failed = True
+            self.pending.clear()
+        finally:
+            if f is not None:
+                f.close()
+
+    @staticmethod
+    def _write_block(f, start, frames):
+        data = zlib.compress(b"".join(frames))
+        f.write(BLOCK.pack(start, len(frames), len(data)) + data)
+
+    def close(self):
+        """Write out everything queued and close the file."""
+        self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+
+RECORDERS = {}
+
+
+def shared(path):
+    """Return the process-wide recorder for path, closed when the process exits."""
+    recorder = RECORDERS.get(path)
+    if recorder is None:
+        recorder = RECORDERS[path] = Recorder(path)
+        atexit.register(recorder.close)
+    return recorder
+
+
+class Recording:
+    """A recording file opened for reading: its header and block index."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < PREFIX.size:
+            raise ValueError("truncated recording header")
+        magic, version, n = PREFIX.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a game recording")
+        self.header = json.loads(data[PREFIX.size:PREFIX.size + n])
+        self.pairs = {int(k): tuple(v) for k, v in self.header["pairs"].items()}
+        self.data = data
+        # (start time, frame count, offset, length) per block
+        self.blocks = []
+        offset = PREFIX.size + n
+        while offset + BLOCK.size <= len(data):
+            start, count, length = BLOCK.unpack_from(data, offset)
+            offset += BLOCK.size
+            self.blocks.append((start, count, offset, length))
+            offset += length
+
+    def block_frames(self, i):
+        _, _, offset, length = self.blocks[i]
+        return decode_frames(zlib.decompress(self.data[offset:offset + length]))
+
+    def frames(self, start_block=0):
+        for i in range(start_block, len(self.blocks)):
+            yield from self.block_frames(i)
+
+    def duration(self):
+        t = 0.0
+        if self.blocks:
+            for t, *_ in self.block_frames(len(self.blocks) - 1):
+                pass
+        return t
+
+    def seek(self, t):
+        """Return (terminal at time t, frames after t), decoding only from the block holding t."""
+        i = 0
+        while i + 1 < len(self.blocks) and self.blocks[i + 1][0] <= t:
+            i += 1
+        term = Terminal()
+        frames = self.frames(i)
+        for frame in frames:
+            if frame[0] > t:
+                return term, itertools.chain([frame], frames)
+            term.apply(*frame[1:])
+        return term, iter(())
+
+
+def sgr(attr, pairs):
+    """Return the ANSI escape that selects a curses attribute."""
+    codes = ["0"]
+    if attr & curses.A_BOLD:
+        codes.append("1")
+    if attr & curses.A_DIM:
+        codes.append("2")
+    if attr & curses.A_UNDERLINE:
+        codes.append("4")
+    if attr & curses.A_REVERSE:
+        codes.append("7")
+    fg, bg = pairs.get((attr & curses.A_COLOR) >> 8, (-1, -1))
+    if 0 <= fg < 8:
+        codes.append(str(30 + fg))
+    elif fg >= 8:
+        codes.append(f"38;5;{fg}")
+    if 0 <= bg < 8:
+        codes.append(str(40 + bg))
+    elif bg >= 8:
+        codes.append(f"48;5;{bg}")
+    return f"\x1b[{';'.join(codes)}m"
+
+
+def ansi(flags, spans, pairs):
+    """Return the terminal output that draws one frame."""
+    out = ["\x1b[0m\x1b[2J"] if flags & CLEAR else []
+    for y, x, text, attr in spans:
+        out.append(f"\x1b[{y + 1};{x + 1}H{sgr(attr, pairs)}{text}")
+    return "".join(out)
+
+
+def export_cast(rec, out):
+    """Write rec as an asciicast v2 file."""
+    h = w = 0
+    for t, flags, fh, fw, _ in rec.frames():
+        h, w = max(h, fh), max(w, fw)
+    with open(out, "w", encoding="utf-8") as f:
+        header = {"version": 2, "width": w, "height": h, "timestamp": int(rec.header["started"])}
+        f.write(json.dumps(header) + "\n")
+        size = None
+        for t, flags, fh, fw, spans in rec.frames():
+            if flags & KEY:
+                continue
+            if (fh, fw) != size:
+                if size is not None:
+                    f.write(json.dumps([round(t, 6), "r", f"{fw}x{fh}"]) + "\n")
+                size = (fh, fw)
+            f.write(json.dumps([round(t, 6), "o", ansi(flags, spans, rec.pairs)]) + "\n")
+
+
+def play(rec, seek=0.0, speed=1.0):
+    """Replay rec on this terminal from `seek` seconds in."""
+    out = sys.stdout
+    term, frames = rec.seek(seek)
+    out.write("\x1b[?25l" + ansi(CLEAR, term.spans(), rec.pairs))
+    out.flush()
+    start = time.perf_counter() - seek / speed
+    try:
+        for t, flags, h, w, spans in frames:
+            if flags & KEY:
+                continue
+            delay = start + t / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            out.write(ansi(flags, spans, rec.pairs))
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.write("\x1b[0m\x1b[?25h\n")
+        out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back or export a game recording")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("play", help="replay in this terminal")
+    p.add_argument("file")
+    p.add_argument("--seek", type=float, default=0.0, metavar="SECONDS")
+    p.add_argument("--speed", type=float, default=1.0)
+    p = commands.add_parser("export", help="convert to asciicast v2")
+    p.add_argument("file")
+    p.add_argument("out")
+    p = commands.add_parser("info", help="print size, length and block count")
+    p.add_argument("file")
+    args = parser.parse_args(argv)
+
+    rec = Recording(args.file)
+    if args.command == "play":
+        play(rec, args.seek, args.speed)
+    elif args.command == "export":
+        export_cast(rec, args.out)
+    else:
+        # Every block repeats the screen in one keyframe.
+        frames = sum(count - 1 for _, count, _, _ in rec.blocks)
+        size = os.path.getsize(args.file)
+        print(f"{args.file}: {rec.duration():.1f}s, {frames} frames in {len(rec.blocks)} blocks, {size:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Double-buffered terminal rendering shared by the games.
+
+A game draws each frame into a Screen, an off-screen grid of characters
+and attributes, instead of writing to curses directly. flush() compares
+every row with what the terminal already shows and emits only the spans
+that changed, merging nearby changes with the same attribute into one
+call. Content that rarely changes, like borders and help text, is drawn
+once into a cached Layer and copied in as the background of each frame.
+
+Set RENDER_STATS=1 to print calls and bytes per frame when a game exits,
+and RECORD=FILE to record the session (see recording).
+"""
+
+import atexit
+import curses
+import os
+import sys
+from dataclasses import dataclass
+
+import tracing
+
+RENDER_STATS = os.environ.get("RENDER_STATS")
+RECORD = os.environ.get("RECORD")
+# Unchanged cells a span may bridge to reach the next change; a separate
+# call costs a cursor move, which is several bytes on the wire.
+MERGE_GAP = 4
+
+
+@dataclass
+class FrameStats:
+    frames: int = 0
+    calls: int = 0
+    bytes: int = 0
+    last_calls: int = 0
+    last_bytes: int = 0
+
+    def add(self, calls, nbytes):
+        self.frames += 1
+        self.calls += calls
+        self.bytes += nbytes
+        self.last_calls = calls
+        self.last_bytes = nbytes
+
+    def merge(self, other):
+        self.frames += other.frames
+        self.calls += other.calls
+        self.bytes += other.bytes
+
+    def summary(self):
+        frames = max(1, self.frames)
+        return f"{self.frames} frames, {self.calls / frames:.1f} calls and {self.bytes / frames:.0f} bytes per frame"
+
+
+# The stats of every Screen made while RENDER_STATS is set, summed at exit.
+screen_stats = []
+
+
+def print_stats():
+    total = FrameStats()
+    for stats in screen_stats:
+        total.merge(stats)
+    print(f"render: {total.summary()}", file=sys.stderr)
+
+
+if RENDER_STATS:
+    atexit.register(print_stats)
+
+
+class Layer:
+    """A grid of characters and attributes written like a curses window."""
+
+    def __init__(self, h, w):
+        self.h = h
+        self.w = w
+        self.chars = [[" "] * w for _ in range(h)]
+        self.attrs = [[curses.A_NORMAL] * w for _ in range(h)]
+
+    def addstr(self, y, x, text, attr=curses.A_NORMAL):
+        """Write text at (y, x), clipped to the grid."""
+        if not 0 <= y < self.h or x >= self.w:
+            return
+        if x < 0:
+            text = text[-x:]
+            x = 0
+        text = text[:self.w - x]
+        if text:
+            self.chars[y][x:x + len(text)] = text
+            self.attrs[y][x:x + len(text)] = [attr] * len(text)
+
+    def plot(self, cells, attr=curses.A_NORMAL):
+        """Write single characters from (y, x, char) triples in one pass, skipping those off the grid."""
+        chars, attrs, h, w = self.chars, self.attrs, self.h, self.w
+        for y, x, ch in cells:
+            if 0 <= y < h and 0 <= x < w:
+                chars[y][x] = ch
+                attrs[y][x] = attr
+
+    def clear_to_eol(self, y, x=0):
+        if 0 <= y < self.h and x < self.w:
+            self.chars[y][x:] = " " * (self.w - x)
+            self.attrs[y][x:] = [curses.A_NORMAL] * (self.w - x)
+
+
+def changed_spans(chars, attrs, old_chars, old_attrs):
+    """Yield (x, text, attr) runs covering every cell where a row differs from its old version."""
+    w = len(chars)
+    x = 0
+    while x < w:
+        if chars[x] == old_chars[x] and attrs[x] == old_attrs[x]:
+            x += 1
+            continue
+        start, attr = x, attrs[x]
+        end = x = x + 1
+        while x < w and attrs[x] == attr:
+            if chars[x] != old_chars[x] or attrs[x] != old_attrs[x]:
+                end = x + 1
+            elif x - end >= MERGE_GAP:
+                break
+            x += 1
+        yield start, "".join(chars[start:end]), attr
+        x = end
+
+
+class Screen(Layer):
+    """The back buffer of a curses window, flushed to it by row diff."""
+
+    def __init__(self, stdscr, recorder=None):
+        self.stdscr = stdscr
+        self.layers = {}
+        self.stats = FrameStats()
+        self.recorder = recorder
+        if recorder is None and RECORD:
+            import recording
+
+            self.recorder = recording.shared(RECORD)
+        self.resize()
+        if RENDER_STATS:
+            screen_stats.append(self.stats)
+
+    def resize(self):
+        """Match the window size; the next flush repaints everything."""
+        h, w = self.stdscr.getmaxyx()
+        Layer.__init__(self, h, w)
+        self.shown = None
+        self.layers.clear()
+
+    def check_size(self):
+        if self.stdscr.getmaxyx() != (self.h, self.w):
+            self.resize()
+
+    def invalidate(self):
+        """Forget what the terminal shows, e.g. after something else drew on it."""
+        self.shown = None
+
+    def layer(self, name, paint):
+        """Return the cached layer `name`, painting it with paint(layer) on first use or after a resize."""
+        self.check_size()
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = Layer(self.h, self.w)
+            paint(layer)
+            self.layers[name] = layer
+        return layer
+
+    def clear(self, base=None):
+        """Start a new frame: blank, or a copy of the base layer."""
+        self.check_size()
+        if base is None or (base.h, base.w) != (self.h, self.w):
+            Layer.__init__(self, self.h, self.w)
+            return
+        self.chars = [row[:] for row in base.chars]
+        self.attrs = [row[:] for row in base.attrs]
+
+    @tracing.traced
+    def flush(self):
+        """Write the rows that differ from the terminal and refresh it."""
+        stdscr = self.stdscr
+        clear = self.shown is None
+        if clear:
+            stdscr.erase()
+            blank = Layer(self.h, self.w)
+            self.shown = (blank.chars, blank.attrs)
+        shown_chars, shown_attrs = self.shown
+        calls = nbytes = 0
+        # The spans written, for the recorder.
+        spans = [] if self.recorder is not None else None
+        for y in range(self.h):
+            chars, attrs = self.chars[y], self.attrs[y]
+            if chars == shown_chars[y] and attrs == shown_attrs[y]:
+                continue
+            for x, text, attr in changed_spans(chars, attrs, shown_chars[y], shown_attrs[y]):
+                try:
+                    stdscr.addstr(y, x, text, attr)
+                except curses.error:
+                    # Writing the bottom-right cell fails after drawing it.
+                    pass
+                calls += 1
+                nbytes += len(text.encode())
+                if spans is not None:
+                    spans.append((y, x, text, attr))
+            shown_chars[y] = chars[:]
+            shown_attrs[y] = attrs[:]
+        stdscr.refresh()
+        self.stats.add(calls, nbytes)
+        if self.recorder is not None and (spans or clear):
+            self.recorder.frame(clear, self.h, self.w, spans)
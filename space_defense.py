@@ -12,10 +12,16 @@ Controls:
 """
 
 import curses
+import itertools
+import math
 import random
-import time
 from dataclasses import dataclass, field
 
+import gamedb
+import tracing
+from frameclock import FrameClock
+from screenbuf import Screen
+
 
 @dataclass
 class Player:
@@ -49,11 +55,93 @@ class PowerUp:
     speed: float = 0.35
 
 
-@dataclass
-class Explosion:
-    x: int
-    y: int
-    ttl: float = 0.12
+# Explosion particles: lifetime (s) and count per burst, and the cap on
+# live particles, past which the oldest are dropped.
+KILL_LIFE = 0.35
+KILL_PARTICLES = 16
+BOSS_PARTICLES = 64
+BOMB_LIFE = 0.5
+BOMB_PARTICLES = 12
+MAX_PARTICLES = 20000
+# Fraction of its speed a particle keeps after one second.
+PARTICLE_DRAG = 0.05
+# Glyphs from nearly burnt out to fresh.
+RAMP = ".:+*@"
+# (vx, vy, life factor) picked at random per particle: 32 directions at 4
+# speeds, faster ones dying sooner. Cells are about twice as tall as wide,
+# so vertical speeds are halved.
+BURST = [
+    (math.cos(a) * speed, math.sin(a) * speed * 0.5, life)
+    for a in (math.tau * i / 32 for i in range(32))
+    for speed, life in ((4.0, 1.0), (8.0, 0.8), (12.0, 0.6), (16.0, 0.45))
+]
+
+
+class Particles:
+    """Every live explosion particle, in parallel arrays indexed by particle.
+
+    Positions and velocities are in cells and cells per second; ttls count
+    down, and ttl times fade is the glyph's index in RAMP. Bursts append,
+    and update() moves, ages and culls all particles in one pass per
+    array. The particles' own rng leaves the game's untouched.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.clear()
+
+    def clear(self):
+        self.xs = []
+        self.ys = []
+        self.vxs = []
+        self.vys = []
+        self.ttls = []
+        self.fades = []
+
+    def __len__(self):
+        return len(self.ttls)
+
+    def burst(self, points, n, life):
+        """Spawn n particles at each (x, y) cell in points."""
+        picks = self.rng.choices(BURST, k=len(points) * n)
+        # The +0.5 puts particles mid-cell, so int() rounds them to a cell.
+        self.xs += [x + 0.5 for x, _ in points for _ in range(n)]
+        self.ys += [y + 0.5 for _, y in points for _ in range(n)]
+        self.vxs += [vx for vx, _, _ in picks]
+        self.vys += [vy for _, vy, _ in picks]
+        self.ttls += [life * f for _, _, f in picks]
+        self.fades += [(len(RAMP) - 1) / (life * f) for _, _, f in picks]
+        excess = len(self.ttls) - MAX_PARTICLES
+        if excess > 0:
+            for arr in (self.xs, self.ys, self.vxs, self.vys, self.ttls, self.fades):
+                del arr[:excess]
+
+    def update(self, dt):
+        if not self.ttls:
+            return
+        keep = PARTICLE_DRAG ** dt
+        vxs = [v * keep for v in self.vxs]
+        vys = [v * keep for v in self.vys]
+        xs = [x + v * dt for x, v in zip(self.xs, vxs)]
+        ys = [y + v * dt for y, v in zip(self.ys, vys)]
+        ttls = [t - dt for t in self.ttls]
+        fades = self.fades
+        live = [t > 0.0 for t in ttls]
+        if not all(live):
+            xs, ys, vxs, vys, ttls, fades = (
+                list(itertools.compress(arr, live)) for arr in (xs, ys, vxs, vys, ttls, fades)
+            )
+        self.xs, self.ys, self.vxs, self.vys, self.ttls, self.fades = xs, ys, vxs, vys, ttls, fades
+
+    def draw(self, layer, width, height, attr):
+        """Plot the particles inside the playfield onto layer in one batch."""
+        glyphs = [RAMP[int(t * f + 0.5)] for t, f in zip(self.ttls, self.fades)]
+        # One entry per cell; bursts overlap heavily, and the newest particle wins.
+        cells = dict(zip(zip(map(int, self.ys), map(int, self.xs)), glyphs))
+        layer.plot(
+            ((y, x, ch) for (y, x), ch in cells.items() if 1 < y < height - 2 and 1 < x < width - 1),
+            attr,
+        )
 
 
 @dataclass
@@ -64,12 +152,15 @@ class GameState:
     level: int = 1
     enemies: list = field(default_factory=list)
     bullets: list = field(default_factory=list)
-    explosions: list = field(default_factory=list)
+    explosions: Particles = field(default_factory=Particles)
     powerups: list = field(default_factory=list)
     combo_multiplier: int = 1
     last_kill_time: float = 0.0
     game_over: bool = False
     boss_level_spawned: int = 0
+    spawn_cd: float = 0.0
+    now: float = 0.0  # game clock at the last advance()
+    rng: random.Random = field(default_factory=random.Random)
 
 
 FIRE_COOLDOWN = 0.2
@@ -84,22 +175,6 @@ ENEMY_TYPES = [
 ]
 
 
-def load_highscore(path="/tmp/.space_defense_highscore"):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return int(f.read().strip() or "0")
-    except Exception:
-        return 0
-
-
-def save_highscore(score, path="/tmp/.space_defense_highscore"):
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(str(score))
-    except Exception:
-        pass
-
-
 def compute_level(score: int) -> int:
     return max(1, score // 500 + 1)
 
@@ -112,7 +187,10 @@ def enemy_speed_multiplier(level: int) -> float:
     return 1.0 + (level - 1) * 0.10
 
 
-def pick_enemy_type(level: int):
+NOOP, MOVE_LEFT, MOVE_RIGHT, SHOOT, BOMB = range(5)
+
+
+def pick_enemy_type(level: int, rng=random):
     if level < 3:
         weights = [0.85, 0.15, 0.00]
     elif level < 6:
@@ -120,7 +198,7 @@ def pick_enemy_type(level: int):
     else:
         weights = [0.45, 0.35, 0.20]
 
-    r = random.random()
+    r = rng.random()
     acc = 0.0
     for i, w in enumerate(weights):
         acc += w
@@ -149,8 +227,8 @@ def add_bullet(gs: GameState, player: Player):
 
 
 def spawn_enemy(gs: GameState):
-    kind, hp, base_speed = pick_enemy_type(gs.level)
-    x = random.randint(2, gs.width - 3)
+    kind, hp, base_speed = pick_enemy_type(gs.level, gs.rng)
+    x = gs.rng.randint(2, gs.width - 3)
     speed = base_speed * enemy_speed_multiplier(gs.level)
     gs.enemies.append(Enemy(x=x, y=2.0, hp=hp, kind=kind, speed=speed))
 
@@ -164,32 +242,34 @@ def maybe_spawn_boss(gs: GameState):
 
 
 def maybe_spawn_powerup(gs: GameState):
-    if random.random() < 0.004:
-        kind = "shield" if random.random() < 0.6 else "bomb"
-        gs.powerups.append(PowerUp(x=random.randint(2, gs.width - 3), y=2.0, kind=kind))
+    if gs.rng.random() < 0.004:
+        kind = "shield" if gs.rng.random() < 0.6 else "bomb"
+        gs.powerups.append(PowerUp(x=gs.rng.randint(2, gs.width - 3), y=2.0, kind=kind))
 
 
+@tracing.traced
 def update_bullets(gs: GameState, dt: float):
     for b in gs.bullets:
         b.y -= 25.0 * dt
     gs.bullets = [b for b in gs.bullets if b.y >= 2]
 
 
+@tracing.traced
 def update_enemies(gs: GameState, dt: float):
     for e in gs.enemies:
         e.y += e.speed * 12.0 * dt
 
 
+@tracing.traced
 def update_powerups(gs: GameState, dt: float):
     for p in gs.powerups:
         p.y += p.speed * 12.0 * dt
     gs.powerups = [p for p in gs.powerups if p.y < gs.height - 2]
 
 
+@tracing.traced
 def update_explosions(gs: GameState, dt: float):
-    for ex in gs.explosions:
-        ex.ttl -= dt
-    gs.explosions = [ex for ex in gs.explosions if ex.ttl > 0]
+    gs.explosions.update(dt)
 
 
 def enemy_hitbox(e: Enemy):
@@ -222,13 +302,12 @@ def detonate_bomb(gs: GameState, player: Player):
         return
     player.bombs -= 1
     kills = len(gs.enemies)
-    for e in gs.enemies:
-        ex, ey = e.x, int(round(e.y))
-        gs.explosions.append(Explosion(x=ex, y=ey, ttl=0.18))
+    gs.explosions.burst([(e.x, int(round(e.y))) for e in gs.enemies], BOMB_PARTICLES, BOMB_LIFE)
     gs.enemies.clear()
     gs.score += kills * 15
 
 
+@tracing.traced
 def handle_collisions(gs: GameState, player: Player, now: float):
     bullets_to_remove = set()
     enemies_to_remove = set()
@@ -244,7 +323,8 @@ def handle_collisions(gs: GameState, player: Player, now: float):
                 e.hp -= 1
                 if e.hp <= 0:
                     enemies_to_remove.add(ei)
-                    gs.explosions.append(Explosion(x=e.x, y=ey))
+                    n = BOSS_PARTICLES if e.kind == "boss" else KILL_PARTICLES
+                    gs.explosions.burst([(e.x, ey)], n, KILL_LIFE)
                     gs.combo_multiplier = 2 if now - gs.last_kill_time <= 1.0 else 1
                     gs.last_kill_time = now
                     gs.score += ENEMY_POINTS[e.kind] * gs.combo_multiplier
@@ -275,45 +355,82 @@ def handle_collisions(gs: GameState, player: Player, now: float):
     gs.powerups = powerups_left
 
 
-def draw_borders(stdscr, gs: GameState):
+def apply_action(gs: GameState, player: Player, action: int, now: float):
+    if action == MOVE_LEFT:
+        player.x = max(2, player.x - 1)
+    elif action == MOVE_RIGHT:
+        player.x = min(gs.width - 3, player.x + 1)
+    elif action == SHOOT:
+        if can_shoot(player, now):
+            add_bullet(gs, player)
+            player.last_shot_time = now
+    elif action == BOMB:
+        detonate_bomb(gs, player)
+
+
+@tracing.traced
+def advance(gs: GameState, player: Player, now: float, dt: float):
+    """Move the world on by dt seconds: spawns, movement and collisions."""
+    gs.now = now
+    gs.level = compute_level(gs.score)
+    maybe_spawn_boss(gs)
+    update_bullets(gs, dt)
+    update_enemies(gs, dt)
+    update_powerups(gs, dt)
+    update_explosions(gs, dt)
+    maybe_spawn_powerup(gs)
+
+    gs.spawn_cd -= dt
+    if gs.spawn_cd <= 0.0:
+        spawn_enemy(gs)
+        gs.spawn_cd = spawn_interval(gs.level)
+
+    handle_collisions(gs, player, now)
+
+
+@tracing.traced
+def draw_borders(layer, gs: GameState):
     w, h = gs.width, gs.height
-    stdscr.addstr(0, 0, "+" + "-" * (w - 2) + "+")
+    layer.addstr(0, 0, "+" + "-" * (w - 2) + "+")
     for y in range(1, h - 1):
-        stdscr.addstr(y, 0, "|")
-        stdscr.addstr(y, w - 1, "|")
-    stdscr.addstr(h - 1, 0, "+" + "-" * (w - 2) + "+")
+        layer.addstr(y, 0, "|")
+        layer.addstr(y, w - 1, "|")
+    layer.addstr(h - 1, 0, "+" + "-" * (w - 2) + "+")
+
+    footer = " ←/A →/D Move  SPACE Shoot  B Bomb  Q Quit "
+    layer.addstr(h - 2, 2, footer[: w - 4])
 
 
-def render(stdscr, gs: GameState, player: Player, highscore: int, hardcore: bool):
-    stdscr.erase()
-    draw_borders(stdscr, gs)
+@tracing.traced
+def render(screen, gs: GameState, player: Player, highscore: int, hardcore: bool):
+    screen.clear(screen.layer("borders", lambda layer: draw_borders(layer, gs)))
 
     hearts = "♥" * max(0, player.lives)
     hud = (
         f" SCORE: {gs.score:05d} HIGH: {highscore:05d} LIVES: {hearts:<3} "
         f"LVL: {gs.level} SH:{player.shield_charges} B:{player.bombs}"
     )
-    stdscr.addstr(1, 2, hud[: gs.width - 4], curses.color_pair(4))
+    screen.addstr(1, 2, hud[: gs.width - 4], curses.color_pair(4))
     if hardcore:
-        stdscr.addstr(2, 2, "HARDCORE", curses.color_pair(2))
+        screen.addstr(2, 2, "HARDCORE", curses.color_pair(2))
 
     # Enemies
     for e in gs.enemies:
         ex, ey = e.x, int(round(e.y))
         if e.kind == "boss":
             if 1 < ey < gs.height - 3 and 3 < ex < gs.width - 4:
-                stdscr.addstr(ey, ex - 2, "[MMM]", curses.color_pair(2))
-                stdscr.addstr(ey + 1, ex - 2, f" {e.hp:02d} ", curses.color_pair(2))
+                screen.addstr(ey, ex - 2, "[MMM]", curses.color_pair(2))
+                screen.addstr(ey + 1, ex - 2, f" {e.hp:02d} ", curses.color_pair(2))
         else:
             if 1 < ey < gs.height - 2 and 1 < ex < gs.width - 1:
                 ch = "V" if e.kind != "tank" else "W"
-                stdscr.addstr(ey, ex, ch, curses.color_pair(2))
+                screen.addstr(ey, ex, ch, curses.color_pair(2))
 
     # Bullets
     for b in gs.bullets:
         x, y = b.x, int(round(b.y))
         if 1 < y < gs.height - 2 and 1 < x < gs.width - 1:
-            stdscr.addstr(y, x, "|", curses.color_pair(3))
+            screen.addstr(y, x, "|", curses.color_pair(3))
 
     # Powerups
     for p in gs.powerups:
@@ -321,34 +438,29 @@ def render(stdscr, gs: GameState, player: Player, highscore: int, hardcore: bool
         if 1 < y < gs.height - 2 and 1 < x < gs.width - 1:
             ch = "#" if p.kind == "shield" else "B"
             col = curses.color_pair(6) if p.kind == "shield" else curses.color_pair(3)
-            stdscr.addstr(y, x, ch, col)
+            screen.addstr(y, x, ch, col)
 
-    for ex in gs.explosions:
-        if 1 < ex.y < gs.height - 2 and 1 < ex.x < gs.width - 1:
-            stdscr.addstr(ex.y, ex.x, "*", curses.color_pair(5))
+    gs.explosions.draw(screen, gs.width, gs.height, curses.color_pair(5))
 
     py = gs.height - 3
     if player.shield_charges > 0:
-        stdscr.addstr(py, player.x - 1, "(^)", curses.color_pair(6))
+        screen.addstr(py, player.x - 1, "(^)", curses.color_pair(6))
     else:
-        stdscr.addstr(py, player.x, "^", curses.color_pair(1))
+        screen.addstr(py, player.x, "^", curses.color_pair(1))
 
-    footer = " ←/A →/D Move  SPACE Shoot  B Bomb  Q Quit "
-    stdscr.addstr(gs.height - 2, 2, footer[: gs.width - 4])
-
-    if gs.combo_multiplier > 1 and time.time() - gs.last_kill_time <= 1.0:
-        stdscr.addstr(2, gs.width - 14, "COMBO x2!", curses.color_pair(3))
+    if gs.combo_multiplier > 1 and gs.now - gs.last_kill_time <= 1.0:
+        screen.addstr(2, gs.width - 14, "COMBO x2!", curses.color_pair(3))
 
     if gs.game_over:
         msg1 = "GAME OVER"
         msg2 = f"Score: {gs.score}   Level: {gs.level}"
         msg3 = "Press R to restart or Q to quit"
         cx = gs.width // 2
-        stdscr.addstr(gs.height // 2 - 1, max(2, cx - len(msg1) // 2), msg1, curses.color_pair(2))
-        stdscr.addstr(gs.height // 2, max(2, cx - len(msg2) // 2), msg2)
-        stdscr.addstr(gs.height // 2 + 1, max(2, cx - len(msg3) // 2), msg3)
+        screen.addstr(gs.height // 2 - 1, max(2, cx - len(msg1) // 2), msg1, curses.color_pair(2))
+        screen.addstr(gs.height // 2, max(2, cx - len(msg2) // 2), msg2)
+        screen.addstr(gs.height // 2 + 1, max(2, cx - len(msg3) // 2), msg3)
 
-    stdscr.refresh()
+    screen.flush()
 
 
 def mode_menu(stdscr):
@@ -373,8 +485,21 @@ def mode_menu(stdscr):
             return hardcore
 
 
-def reset_round(width: int, height: int, hardcore: bool):
-    gs = GameState(width=width, height=height)
+KEY_ACTIONS = {
+    curses.KEY_LEFT: MOVE_LEFT,
+    ord("a"): MOVE_LEFT,
+    ord("A"): MOVE_LEFT,
+    curses.KEY_RIGHT: MOVE_RIGHT,
+    ord("d"): MOVE_RIGHT,
+    ord("D"): MOVE_RIGHT,
+    ord(" "): SHOOT,
+    ord("b"): BOMB,
+    ord("B"): BOMB,
+}
+
+
+def reset_round(width: int, height: int, hardcore: bool, seed=None):
+    gs = GameState(width=width, height=height, rng=random.Random(seed), explosions=Particles(seed))
     player = Player(x=width // 2, lives=(1 if hardcore else 3))
     return gs, player
 
@@ -395,65 +520,49 @@ def game(stdscr):
     height = max(20, min(35, h - 1))
 
     gs, player = reset_round(width, height, hardcore)
-    highscore = load_highscore()
+    store = gamedb.Store()
+    board = "hardcore" if hardcore else "normal"
+    highscore = store.high_score("space", board)
+    screen = Screen(stdscr)
+    # The world advances in fixed FRAME_TIME steps on the clock's time,
+    # however long a frame took to draw.
+    clock = FrameClock(FRAME_TIME)
+    started = clock.time
+
+    def record():
+        store.record(gamedb.Session("space", gs.score, clock.time - started, mode=board, level=gs.level))
 
-    last = time.time()
-    spawn_cd = 0.0
-
-    while True:
-        now = time.time()
-        dt = now - last
-        last = now
-
-        key = stdscr.getch()
-        if key in (ord("q"), ord("Q")):
-            break
+    try:
+        while True:
+            key = stdscr.getch()
+            tracing.check_key(key)
+            if key in (ord("q"), ord("Q")):
+                break
 
-        if gs.game_over:
-            if key in (ord("r"), ord("R")):
-                gs, player = reset_round(width, height, hardcore)
-                spawn_cd = 0.0
-                last = time.time()
-            render(stdscr, gs, player, highscore, hardcore)
-            time.sleep(FRAME_TIME)
-            continue
-
-        if key in (curses.KEY_LEFT, ord("a"), ord("A")):
-            player.x = max(2, player.x - 1)
-        elif key in (curses.KEY_RIGHT, ord("d"), ord("D")):
-            player.x = min(width - 3, player.x + 1)
-        elif key == ord(" "):
-            if can_shoot(player, now):
-                add_bullet(gs, player)
-                player.last_shot_time = now
-        elif key in (ord("b"), ord("B")):
-            detonate_bomb(gs, player)
-
-        gs.level = compute_level(gs.score)
-        maybe_spawn_boss(gs)
-        update_bullets(gs, dt)
-        update_enemies(gs, dt)
-        update_powerups(gs, dt)
-        update_explosions(gs, dt)
-        maybe_spawn_powerup(gs)
-
-        spawn_cd -= dt
-        if spawn_cd <= 0.0:
-            spawn_enemy(gs)
-            spawn_cd = spawn_interval(gs.level)
-
-        handle_collisions(gs, player, now)
-
-        if gs.score > highscore:
-            highscore = gs.score
-            save_highscore(highscore)
-
-        render(stdscr, gs, player, highscore, hardcore)
-
-        elapsed = time.time() - now
-        sleep_for = FRAME_TIME - elapsed
-        if sleep_for > 0:
-            time.sleep(sleep_for)
+            if gs.game_over:
+                # Nothing moves until the player restarts or quits.
+                stdscr.nodelay(False)
+                if key in (ord("r"), ord("R")):
+                    gs, player = reset_round(width, height, hardcore)
+                    stdscr.nodelay(True)
+                    clock.reset()
+                    started = clock.time
+                render(screen, gs, player, highscore, hardcore)
+                continue
+
+            apply_action(gs, player, KEY_ACTIONS.get(key, NOOP), clock.time)
+            for now in clock.steps():
+                advance(gs, player, now, FRAME_TIME)
+            if gs.game_over:
+                record()
+
+            highscore = max(highscore, gs.score)
+            render(screen, gs, player, highscore, hardcore)
+            clock.wait()
+        if not gs.game_over:
+            record()
+    finally:
+        store.close()
 
 
 def main():
@@ -0,0 +1,464 @@
+"""
+Randomized checks that the fast paths agree with the simple ones.
+
+Usage:
+  python -m unittest test_games
+"""
+
+import copy
+import curses
+import io
+import itertools
+import os
+import random
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import dino
+import envs
+import mines
+import mines_pool
+import mines_save
+import mines_solver
+import recording
+import tetris
+import tetris_batch
+import tetris_replay
+
+
+class DinoPopulationMatchesGames(unittest.TestCase):
+    def test_runners_die_as_separate_games_do(self):
+        rng = random.Random(3)
+        n = 60
+        scores = set()
+        for seed in range(10):
+            reach = [rng.randint(-1, 16) for _ in range(n)]
+            population = dino.Population(n, seed=seed)
+            games = [dino.DinoGame(seed=seed) for _ in range(n)]
+            while not population.game_over:
+                # Jump at each runner's own distance (-1: never), otherwise duck half the time.
+                actions = bytes(2 if not a and rng.random() < 0.5 else a for a in dino.reach_actions(population, reach))
+                population.act(actions)
+                population.update()
+                for i, (g, a) in enumerate(zip(games, actions)):
+                    if g.game_over:
+                        continue
+                    if a == 1:
+                        g.jump()
+                    g.set_duck(a == 2)
+                    g.update()
+                    self.assertEqual(bool(population.alive[i]), not g.game_over)
+                    if population.alive[i]:
+                        self.assertEqual((population.ys[i], population.score), (g.player_y, g.score))
+            self.assertEqual(population.scores, [g.score for g in games])
+            scores.update(population.scores)
+        self.assertGreater(len(scores), 20)
+
+
+class VectorEnvWorkers(unittest.TestCase):
+    def test_workers_match_in_process(self):
+        for name in envs.ENVS:
+            rng = random.Random(name)
+            with envs.VectorEnv(name, 6, workers=0, seed=4) as local, envs.VectorEnv(name, 6, workers=2, seed=4) as pooled:
+                self.assertEqual(bytes(local.reset()), bytes(pooled.reset()))
+                done_count = 0
+                for _ in range(300):
+                    actions = [rng.randrange(local.n_actions) for _ in range(6)]
+                    obs, rewards, dones = local.step(actions)
+                    pooled_obs, pooled_rewards, pooled_dones = pooled.step(actions)
+                    self.assertEqual((bytes(obs), rewards, dones), (bytes(pooled_obs), pooled_rewards, pooled_dones))
+                    done_count += sum(dones)
+                # A space round outlasts 300 random steps; the others restart often.
+                if name != "space":
+                    self.assertGreater(done_count, 6, name)
+
+
+class MinesCounters(unittest.TestCase):
+    def test_counters_follow_every_action(self):
+        rng = random.Random(0)
+        for i in range(200):
+            w, h = rng.randint(2, 30), rng.randint(2, 20)
+            g = mines.Game(w, h, rng.randint(1, w * h // 5 + 1), compact=i % 2 == 1, seed=i)
+            while not g.game_over:
+                x, y = rng.randrange(w), rng.randrange(h)
+                if rng.random() < 0.2:
+                    g.toggle_flag(x, y)
+                else:
+                    g.reveal(x, y)
+                g.check_counters()
+
+
+class MinesPlacement(unittest.TestCase):
+    def test_too_many_mines(self):
+        for compact in (False, True):
+            g = mines.Game(3, 3, 8, compact=compact, seed=0)
+            g.place_mines(1, 1)
+            self.assertEqual(g.hidden_safe, 1)
+            for count in (9, 12):
+                with self.assertRaises(ValueError):
+                    mines.Game(3, 3, count, compact=compact, seed=0).place_mines(1, 1)
+
+
+class FakeWindow:
+    """Just enough of a curses window to keep what was written to it."""
+
+    def __init__(self, h, w):
+        self.h, self.w = h, w
+        self.erase()
+
+    def getmaxyx(self):
+        return self.h, self.w
+
+    def erase(self):
+        self.cells = [[(" ", curses.A_NORMAL)] * self.w for _ in range(self.h)]
+
+    def addstr(self, y, x, text, attr):
+        self.cells[y][x:x + len(text)] = [(ch, attr) for ch in text]
+        del self.cells[y][self.w:]
+
+    def refresh(self):
+        pass
+
+
+class MinesIncrementalDraw(unittest.TestCase):
+    KEYS = [curses.KEY_LEFT, curses.KEY_RIGHT, curses.KEY_UP, curses.KEY_DOWN, ord("w"), ord("a"), ord("s"), ord("d")] * 4 + [
+        curses.KEY_PPAGE, curses.KEY_NPAGE, curses.KEY_HOME, curses.KEY_END, curses.KEY_RESIZE,
+        ord("f"), ord("f"), ord("f"), ord(" "), ord(" "), ord("r"),
+    ]
+
+    def test_updates_match_full_frames(self):
+        rng = random.Random(9)
+        # The timer must not tick between the two frames compared.
+        with mock.patch.object(mines.time, "time", lambda: 1000.0):
+            for i, (w, h, count) in enumerate([(9, 9, 10), (16, 12, 30), (60, 40, 300), (200, 80, 2000)]):
+                g = mines.Game(w, h, count, compact=i % 2 == 1, seed=i)
+                window = FakeWindow(24, 80)
+                screen = mines.Screen(window)
+                view = mines.View()
+                mines.draw(screen, g, view)
+                for _ in range(400):
+                    before = mines.frame_key(g, view)
+                    cursor = (g.cursor_x, g.cursor_y)
+                    mines.handle_key(g, view, rng.choice(self.KEYS))
+                    mines.redraw(screen, g, view, before, cursor)
+
+                    fresh_window = FakeWindow(24, 80)
+                    fresh_view = copy.copy(view)
+                    fresh_view.minimap_key = None
+                    mines.draw(mines.Screen(fresh_window), g, fresh_view)
+                    self.assertEqual(window.cells, fresh_window.cells)
+
+
+def exact_mine_chances(g):
+    """Return {(x, y): P(mine)} for g's hidden cells by trying every layout that fits the revealed numbers."""
+    hidden = [(x, y) for y in range(g.h) for x in range(g.w) if not g.revealed[y][x]]
+    numbers = [(x, y, g.board[y][x]) for y in range(g.h) for x in range(g.w) if g.revealed[y][x]]
+    total = 0
+    hits = dict.fromkeys(hidden, 0)
+    for layout in itertools.combinations(hidden, g.mines):
+        layout = set(layout)
+        if all(sum(c in layout for c in g.neighbors(x, y)) == n for x, y, n in numbers):
+            total += 1
+            for c in layout:
+                hits[c] += 1
+    return {c: n / total for c, n in hits.items()}
+
+
+class MinesSolverExact(unittest.TestCase):
+    def test_analysis_matches_enumeration(self):
+        rng = random.Random(6)
+        solver = mines_solver.Solver()
+        boards = 0
+        for i in range(400):
+            w, h = rng.randint(3, 6), rng.randint(3, 5)
+            g = mines.Game(w, h, rng.randint(1, w * h // 3), compact=i % 2 == 1, seed=i)
+            g.reveal(rng.randrange(w), rng.randrange(h))
+            for _ in range(rng.randrange(4)):
+                x, y = rng.randrange(w), rng.randrange(h)
+                if g.board[y][x] != -1:
+                    g.reveal(x, y)
+            hidden = w * h - g.revealed_count
+            if g.game_over or hidden > 14:
+                continue
+            for _ in range(rng.randrange(3)):
+                g.toggle_flag(rng.randrange(w), rng.randrange(h))
+            boards += 1
+            expected = exact_mine_chances(g)
+            analysis = solver.analyze(g)
+            self.assertEqual(analysis.hidden, hidden)
+            for xy, p in expected.items():
+                self.assertAlmostEqual(analysis.probabilities.get(xy, analysis.outside), p, places=9)
+            frontier = analysis.probabilities.keys()
+            self.assertEqual(analysis.safe, {xy for xy in frontier if expected[xy] == 0})
+            self.assertEqual(analysis.mines, {xy for xy in frontier if expected[xy] == 1})
+
+            move = mines_solver.hint(g, analysis)
+            if move is not None:
+                x, y, p = move
+                self.assertFalse(g.flagged[y][x])
+                self.assertLess(expected[x, y], 1)
+                self.assertAlmostEqual(p, expected[x, y], places=9)
+            else:
+                self.assertTrue(all(g.flagged[y][x] or expected[x, y] == 1 for x, y in expected))
+        self.assertGreater(boards, 200)
+
+    def test_autoplay_reveals_only_safe_cells(self):
+        rng = random.Random(7)
+        solver = mines_solver.Solver()
+        played = 0
+        for i in range(20):
+            g = mines.Game(16, 16, 40, compact=i % 2 == 1, seed=i)
+            view = mines.View()
+            g.reveal(8, 8)
+            for _ in range(10):
+                g.toggle_flag(rng.randrange(16), rng.randrange(16))
+            flagged = [(x, y) for y in range(16) for x in range(16) if g.flagged[y][x]]
+            revealed = g.revealed_count
+            while mines.assist(g, view, solver, autoplay=True):
+                self.assertFalse(g.game_over and not g.win)
+            self.assertFalse(g.game_over and not g.win)
+            self.assertFalse(any(g.revealed[y][x] for x, y in flagged))
+            played += g.revealed_count - revealed
+        self.assertGreater(played, 500)
+
+
+class MinesSaveRoundTrip(unittest.TestCase):
+    def test_saved_games_load_unchanged(self):
+        rng = random.Random(10)
+        sizes = [(rng.randint(2, 60), rng.randint(2, 40)) for _ in range(60)] + [(400, 300), (500, 250)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "game.msav")
+            for i, (w, h) in enumerate(sizes):
+                g = mines.Game(w, h, rng.randint(1, w * h // 5 + 1), compact=i % 2 == 1, seed=i)
+                for _ in range(rng.randrange(30)):
+                    x, y = rng.randrange(w), rng.randrange(h)
+                    if rng.random() < 0.3:
+                        g.toggle_flag(x, y)
+                    elif not g.started or g.board[y][x] != -1 or i % 10 == 0:
+                        g.reveal(x, y)
+                g.cursor_x, g.cursor_y = rng.randrange(w), rng.randrange(h)
+                mines_save.save(g, path)
+                loaded = mines_save.load(path)
+                self.assertEqual(loaded.compact, w * h > mines.COMPACT_CELLS)
+                self.assertEqual(
+                    [bytes(plane) for plane in mines_save.planes(loaded)], [bytes(plane) for plane in mines_save.planes(g)]
+                )
+                self.assertEqual(
+                    (loaded.hidden_safe, loaded.revealed_count, loaded.flags, loaded.mines),
+                    (g.hidden_safe, g.revealed_count, g.flags, g.mines),
+                )
+                self.assertEqual(
+                    (loaded.cursor_x, loaded.cursor_y, loaded.started, loaded.game_over, loaded.win),
+                    (g.cursor_x, g.cursor_y, g.started, g.game_over, g.win),
+                )
+                loaded.check_counters()
+
+
+class MinesPoolFallback(unittest.TestCase):
+    def test_empty_pool_does_not_stall(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mine_map, x, y = mines_pool.BoardPool(9, 9, 10, tmp).take()
+            self.assertEqual((len(mine_map), mine_map.count(1), mine_map[y * 9 + x]), (81, 10, 0))
+            # Dense enough that a no-guess layout is all but impossible.
+            pool = mines_pool.BoardPool(9, 9, 60, tmp)
+            self.assertIsNone(pool.take())
+            g, view = mines.Game(9, 9, 60), mines.View()
+            with mock.patch.object(pool, "refill_async"):
+                mines.deal(g, view, pool)
+            self.assertFalse(g.started)
+            self.assertTrue(view.note)
+
+    def test_stats_skips_other_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mines_pool.BoardPool(9, 9, 10, tmp).push(mines_pool.candidate(9, 9, 10, random.Random(0)))
+            for name in ("notes.txt", "9x9-10.pool.tmp", "axb-c.pool"):
+                open(os.path.join(tmp, name), "w").close()
+            out = io.StringIO()
+            with mock.patch.object(mines_pool, "POOL_DIR", tmp), mock.patch.object(sys, "argv", ["mines_pool.py", "stats"]):
+                with redirect_stdout(out):
+                    mines_pool.main()
+            self.assertEqual(out.getvalue(), "9x9-10.pool: 1 boards\n")
+
+
+class MinesRegionFlood(unittest.TestCase):
+    def test_region_reveal_matches_stack_flood(self):
+        rng = random.Random(1)
+        clicks = 0
+        for i in range(60):
+            w, h = rng.randint(5, 60), rng.randint(5, 40)
+            mine_count = rng.randint(1, w * h // 8)
+            compact = i % 2 == 1
+            fast, slow = (mines.Game(w, h, mine_count, compact=compact, seed=i) for _ in range(2))
+            x, y = rng.randrange(w), rng.randrange(h)
+            fast.place_mines(x, y)
+            slow.place_mines(x, y)
+            for _ in range(rng.randint(0, w * h // 20)):
+                fx, fy = rng.randrange(w), rng.randrange(h)
+                fast.toggle_flag(fx, fy)
+                slow.toggle_flag(fx, fy)
+            for _ in range(20):
+                x, y = rng.randrange(w), rng.randrange(h)
+                if fast.board[y][x] == -1 or fast.flagged[y][x]:
+                    continue
+                fast.flood_reveal(x, y)
+                slow.flood_fill(x, y)
+                clicks += 1
+                self.assertEqual([list(map(bool, row)) for row in fast.revealed], [list(map(bool, row)) for row in slow.revealed])
+                self.assertEqual((fast.revealed_count, fast.hidden_safe), (slow.revealed_count, slow.hidden_safe))
+        self.assertGreater(clicks, 500)
+
+
+def tetris_placement(g, rng):
+    """Actions that drop g's piece where it clears most lines and leaves fewest holes, falling a little on the way."""
+    best = None
+    for turns in range(4):
+        shape = tetris.ROTATIONS[g.cur.kind][(g.cur.rotation + turns) % 4]
+        for x in range(tetris.BOARD_W - len(shape[0]) + 1):
+            y = 0
+            if g.collides(y, x, shape):
+                continue
+            while not g.collides(y + 1, x, shape):
+                y += 1
+            filled = {(y + r, x + c) for r, row in enumerate(shape) for c, cell in enumerate(row) if cell}
+            lines = sum(all(g.board[row][c] or (row, c) in filled for c in range(tetris.BOARD_W)) for row in {r for r, _ in filled})
+            holes = sum(
+                1
+                for row, c in filled
+                if row + 1 < tetris.BOARD_H and (row + 1, c) not in filled and not g.board[row + 1][c]
+            )
+            score = (lines * 10 + y - holes * 4, rng.random())
+            if best is None or score > best[0]:
+                best = (score, turns, x)
+    _, turns, x = best or (None, 0, 0)
+    actions = [tetris.ROTATE] * turns + [tetris.MOVE_LEFT] * (tetris.BOARD_W // 2) + [tetris.MOVE_RIGHT] * x
+    actions += [rng.choice((tetris.GRAVITY, tetris.SOFT_DROP)) for _ in range(rng.randrange(3))]
+    return actions + [tetris.HARD_DROP]
+
+
+class TetrisBatchMatchesGame(unittest.TestCase):
+    def assert_same(self, batch, i, g):
+        self.assertEqual(batch.matrix(i), g.board)
+        self.assertEqual(
+            (batch.kind[i], batch.shape(i), batch.x[i], batch.y[i], batch.next_kind[i]),
+            (g.cur.kind, g.cur.shape, g.cur.x, g.cur.y, g.next_kind),
+        )
+        self.assertEqual(
+            (batch.score[i], batch.lines[i], batch.level[i], batch.game_over[i]),
+            (g.score, g.lines, g.level, g.game_over),
+        )
+
+    def check(self, n, pieces, bag=False):
+        """Play n boards for `pieces` pieces each in both engines; return the lines cleared."""
+        rng = random.Random(n)
+        games = [tetris.Game(seed=i, bag=bag) for i in range(n)]
+        batch = tetris_batch.TetrisBatch(n, seeds=list(range(n)), bag=bag)
+        lines = 0
+        for piece in range(pieces):
+            plans = [tetris_placement(g, rng) for g in games]
+            for step in range(max(map(len, plans))):
+                actions = [plan[step] if step < len(plan) else tetris.GRAVITY for plan in plans]
+                batch.step(actions)
+                for g, action in zip(games, actions):
+                    g.apply(action)
+            for i, g in enumerate(games):
+                if g.game_over:
+                    self.assert_same(batch, i, g)
+                    lines += g.lines
+                    seed = n * (piece + 1) + i
+                    games[i] = tetris.Game(seed=seed, bag=bag)
+                    batch.reset(i, seed)
+        for i, g in enumerate(games):
+            self.assert_same(batch, i, g)
+            lines += g.lines
+        return lines
+
+    def test_play(self):
+        self.assertGreater(self.check(20, 80), 200)
+
+    def test_play_7_bag(self):
+        self.assertGreater(self.check(20, 80, bag=True), 200)
+
+
+class TetrisReplayRoundTrip(unittest.TestCase):
+    def test_replays_verify_and_tampering_is_caught(self):
+        rng = random.Random(8)
+        odd = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "game.trpl")
+            for i in range(40):
+                g = tetris.Game(start_level=rng.randint(1, 5), fixed_level=i % 3 == 0, seed=i, bag=i % 2 == 1)
+                for _ in range(rng.randint(1, 60)):
+                    for action in tetris_placement(g, rng):
+                        g.apply(action)
+                if i % 4 == 0:
+                    g.apply(tetris.GRAVITY)
+                odd += len(g.actions) % 2
+                data = tetris_replay.dumps(g)
+                settings, score, lines, actions = tetris_replay.loads(data)
+                self.assertEqual((score, lines, actions), (g.score, g.lines, bytes(g.actions)))
+                tetris_replay.save(path, g)
+                self.assertTrue(tetris_replay.verify(path)[1])
+
+                fields = list(tetris_replay.HEADER.unpack_from(data))
+                fields[7] += 1
+                with open(path, "wb") as f:
+                    f.write(tetris_replay.HEADER.pack(*fields) + data[tetris_replay.HEADER.size:])
+                self.assertFalse(tetris_replay.verify(path)[1])
+
+                # Turn the first hard drop into a soft drop.
+                j = g.actions.index(tetris.HARD_DROP)
+                body = bytearray(data[tetris_replay.HEADER.size:])
+                body[j >> 1] ^= (tetris.HARD_DROP ^ tetris.SOFT_DROP) << (4 * (j & 1))
+                with open(path, "wb") as f:
+                    f.write(data[:tetris_replay.HEADER.size] + body)
+                self.assertFalse(tetris_replay.verify(path)[1])
+        self.assertGreater(odd, 5)
+
+
+class RecordingSeek(unittest.TestCase):
+    def test_seek_matches_sequential_replay(self):
+        rng = random.Random(2)
+        fed = []
+        h, w = 10, 30
+        for i in range(400):
+            clear = i == 0 or rng.random() < 0.02
+            if clear and rng.random() < 0.5:
+                h, w = rng.randint(5, 20), rng.randint(10, 60)
+            spans = []
+            for _ in range(rng.randint(0, 6)):
+                y, x = rng.randrange(h), rng.randrange(w)
+                text = "".join(rng.choice("ab#* ♥") for _ in range(rng.randint(1, w - x)))
+                spans.append((y, x, text, rng.choice((0, 1 << 8, 2 << 8 | 1 << 21))))
+            fed.append((clear, h, w, spans))
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(recording, "KEYFRAME_FRAMES", 25):
+            path = os.path.join(tmp, "session.rec")
+            recorder = recording.Recorder(path)
+            for frame in fed:
+                recorder.frame(*frame)
+            recorder.close()
+            rec = recording.Recording(path)
+        self.assertGreater(len(rec.blocks), 10)
+
+        frames = [f for f in rec.frames() if not f[1] & recording.KEY]
+        self.assertEqual(
+            [(bool(flags & recording.CLEAR), fh, fw, spans) for _, flags, fh, fw, spans in frames], fed
+        )
+        times = [f[0] for f in frames]
+        for t in rng.sample(times, 40) + [rng.uniform(0, times[-1]) for _ in range(40)]:
+            expected = recording.Terminal()
+            after = []
+            for frame in frames:
+                if frame[0] <= t:
+                    expected.apply(*frame[1:])
+                else:
+                    after.append(frame)
+            term, rest = rec.seek(t)
+            self.assertEqual((term.h, term.w, term.chars, term.attrs), (expected.h, expected.w, expected.chars, expected.attrs))
+            self.assertEqual([f for f in rest if not f[1] & recording.KEY], after)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@
 """
 Terminal Tetris (curses)
 Controls:
-  ←/→ : move
+  ←/→ : move (held: delayed auto-shift, see tetris_input)
   ↓   : soft drop
   ↑   : rotate
   space: hard drop
@@ -12,9 +12,17 @@ Controls:
 """
 
 import curses
+import math
+import os
 import random
 import time
 
+import gamedb
+import tetris_input
+import tracing
+from frameclock import FrameClock
+from screenbuf import Screen
+
 BOARD_W = 10
 BOARD_H = 20
 TICK_START = 0.5
@@ -32,11 +40,37 @@ SHAPES = {
 
 PIECES = list(SHAPES.keys())
 
+# Game inputs as recorded in replays; GRAVITY is the timed soft drop.
+MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP, HARD_DROP, GRAVITY = range(6)
+
+# Finished games are written here as replays when set.
+REPLAY_DIR = os.environ.get("TETRIS_REPLAY_DIR")
+
 
 def rotate_clockwise(mat):
     return [list(row) for row in zip(*mat[::-1])]
 
 
+# The four clockwise rotations of each piece, computed once; shapes taken
+# from here are shared and never modified in place.
+ROTATIONS = {}
+for _kind, _shape in SHAPES.items():
+    ROTATIONS[_kind] = [_shape]
+    for _ in range(3):
+        ROTATIONS[_kind].append(rotate_clockwise(ROTATIONS[_kind][-1]))
+
+
+def piece_sequence(rng, bag=False):
+    """Yield piece kinds from rng, either uniformly or as shuffled 7-bags."""
+    while True:
+        if bag:
+            batch = PIECES[:]
+            rng.shuffle(batch)
+            yield from batch
+        else:
+            yield rng.choice(PIECES)
+
+
 def level_tick(level, speed_multiplier=1.0):
     base = max(MIN_TICK, TICK_START - (level - 1) * 0.04)
     return max(0.03, base / max(0.1, speed_multiplier))
@@ -45,13 +79,20 @@ def level_tick(level, speed_multiplier=1.0):
 class Piece:
     def __init__(self, kind):
         self.kind = kind
-        self.shape = [row[:] for row in SHAPES[kind]]
+        self.rotation = 0
+        self.shape = ROTATIONS[kind][0]
         self.y = 0
         self.x = BOARD_W // 2 - len(self.shape[0]) // 2
 
 
 class Game:
-    def __init__(self, start_level=1, speed_multiplier=1.0, fixed_level=False):
+    def __init__(self, start_level=1, speed_multiplier=1.0, fixed_level=False, seed=None, bag=False):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.bag = bag
+        self.pieces = piece_sequence(random.Random(seed), bag)
+        self.actions = bytearray()
         self.board = [[0] * BOARD_W for _ in range(BOARD_H)]
         self.score = 0
         self.lines = 0
@@ -63,10 +104,10 @@ class Game:
         self.game_over = False
         self.paused = False
         self.cur = self.spawn()
-        self.next_kind = random.choice(PIECES)
+        self.next_kind = next(self.pieces)
 
     def spawn(self):
-        p = Piece(random.choice(PIECES))
+        p = Piece(next(self.pieces))
         if not self.valid(p, p.y, p.x, p.shape):
             self.game_over = True
         return p
@@ -86,6 +127,7 @@ class Game:
     def valid(self, piece, y, x, shape):
         return not self.collides(y, x, shape)
 
+    @tracing.traced
     def lock_piece(self):
         for r, row in enumerate(self.cur.shape):
             for c, cell in enumerate(row):
@@ -95,10 +137,11 @@ class Game:
                         self.board[by][bx] = 1
         self.clear_lines()
         self.cur = Piece(self.next_kind)
-        self.next_kind = random.choice(PIECES)
+        self.next_kind = next(self.pieces)
         if self.collides(self.cur.y, self.cur.x, self.cur.shape):
             self.game_over = True
 
+    @tracing.traced
     def clear_lines(self):
         new_rows = [row for row in self.board if not all(row)]
         cleared = BOARD_H - len(new_rows)
@@ -133,65 +176,91 @@ class Game:
         self.lock_piece()
 
     def rotate(self):
-        rotated = rotate_clockwise(self.cur.shape)
+        rotation = (self.cur.rotation + 1) % 4
+        rotated = ROTATIONS[self.cur.kind][rotation]
         for kick in (0, -1, 1, -2, 2):
             nx = self.cur.x + kick
             if self.valid(self.cur, self.cur.y, nx, rotated):
+                self.cur.rotation = rotation
                 self.cur.shape = rotated
                 self.cur.x = nx
                 return
 
+    def apply(self, action):
+        """Apply one recorded input; all play goes through here so it can be replayed."""
+        if self.game_over:
+            return
+        self.actions.append(action)
+        if action == MOVE_LEFT:
+            self.move(-1)
+        elif action == MOVE_RIGHT:
+            self.move(1)
+        elif action == ROTATE:
+            self.rotate()
+        elif action == HARD_DROP:
+            self.hard_drop()
+        else:
+            self.soft_drop()
+
+
+def board_line(g, y):
+    cells = g.board[y][:]
+    r = y - g.cur.y
+    if 0 <= r < len(g.cur.shape):
+        for c, cell in enumerate(g.cur.shape[r]):
+            x = g.cur.x + c
+            if cell and 0 <= x < BOARD_W:
+                cells[x] = 1
+    return "|" + "".join("██" if v else "  " for v in cells) + "|"
+
+
+BOARD_TOP, BOARD_LEFT = 1, 20
+
+
+@tracing.traced
+def draw_static(layer):
+    layer.addstr(0, 0, "TETRIS")
+    layer.addstr(BOARD_TOP - 1, BOARD_LEFT, "+" + "--" * BOARD_W + "+")
+    layer.addstr(BOARD_TOP + BOARD_H, BOARD_LEFT, "+" + "--" * BOARD_W + "+")
+    layer.addstr(7, 0, "Controls:")
+    layer.addstr(8, 0, "←/→ move, ↑ rotate")
+    layer.addstr(9, 0, "↓ soft drop, space hard drop")
+    layer.addstr(10, 0, "p pause, s settings, q quit")
+
+
+@tracing.traced
+def draw(screen, g):
+    screen.clear(screen.layer("static", draw_static))
+    screen.addstr(1, 0, f"Score: {g.score}")
+    screen.addstr(2, 0, f"Lines: {g.lines}")
+    screen.addstr(3, 0, f"Level: {g.level}")
+    screen.addstr(4, 0, f"Speed x{g.speed_multiplier:.2f}")
 
-def draw(stdscr, g):
-    stdscr.erase()
-    stdscr.addstr(0, 0, "TETRIS")
-    stdscr.addstr(1, 0, f"Score: {g.score}")
-    stdscr.addstr(2, 0, f"Lines: {g.lines}")
-    stdscr.addstr(3, 0, f"Level: {g.level}")
-    stdscr.addstr(4, 0, f"Speed x{g.speed_multiplier:.2f}")
-
-    top, left = 1, 20
-    stdscr.addstr(top - 1, left, "+" + "--" * BOARD_W + "+")
     for y in range(BOARD_H):
-        line = "|"
-        for x in range(BOARD_W):
-            line += "██" if g.board[y][x] else "  "
-        line += "|"
-        stdscr.addstr(top + y, left, line)
-    stdscr.addstr(top + BOARD_H, left, "+" + "--" * BOARD_W + "+")
-
-    for r, row in enumerate(g.cur.shape):
-        for c, cell in enumerate(row):
-            if cell:
-                y = g.cur.y + r
-                x = g.cur.x + c
-                if y >= 0:
-                    stdscr.addstr(top + y, left + 1 + x * 2, "██")
-
-    stdscr.addstr(7, 0, "Controls:")
-    stdscr.addstr(8, 0, "←/→ move, ↑ rotate")
-    stdscr.addstr(9, 0, "↓ soft drop, space hard drop")
-    stdscr.addstr(10, 0, "p pause, s settings, q quit")
+        screen.addstr(BOARD_TOP + y, BOARD_LEFT, board_line(g, y))
 
     if g.paused:
-        stdscr.addstr(13, 0, "PAUSED")
+        screen.addstr(13, 0, "PAUSED")
     if g.game_over:
-        stdscr.addstr(13, 0, "GAME OVER - press q")
+        screen.addstr(13, 0, "GAME OVER - press q")
 
-    stdscr.refresh()
+    screen.flush()
 
 
-def settings_screen(stdscr):
+def settings_screen(stdscr, settings):
     curses.curs_set(0)
     stdscr.nodelay(False)
     stdscr.keypad(True)
 
-    start_level = 1
-    speed_multiplier = 1.0
-    fixed_level = False
+    start_level = settings["start_level"]
+    speed_multiplier = settings["speed_multiplier"]
+    fixed_level = settings["fixed_level"]
+    bag = settings["bag"]
+    das = settings["das"]
+    arr = settings["arr"]
     selected = 0
 
-    items = ["Start level", "Speed multiplier", "Fixed level", "Start game"]
+    items = ["Start level", "Speed multiplier", "Fixed level", "7-bag", "DAS", "ARR", "Start game"]
 
     while True:
         stdscr.erase()
@@ -203,6 +272,9 @@ def settings_screen(stdscr):
             str(start_level),
             f"{speed_multiplier:.2f}x",
             "ON" if fixed_level else "OFF",
+            "ON" if bag else "OFF",
+            f"{das} ms",
+            f"{arr} ms",
             "",
         ]
 
@@ -231,76 +303,171 @@ def settings_screen(stdscr):
                 speed_multiplier = max(0.5, min(3.0, round(speed_multiplier + direction * 0.1, 2)))
             elif selected == 2:
                 fixed_level = not fixed_level
+            elif selected == 3:
+                bag = not bag
+            elif selected == 4:
+                das = max(0, min(500, das + direction * 10))
+            elif selected == 5:
+                arr = max(0, min(200, arr + direction * 5))
         elif key in (10, 13, curses.KEY_ENTER):
-            if selected == 3:
+            if selected == 6:
                 return {
                     "start_level": start_level,
                     "speed_multiplier": speed_multiplier,
                     "fixed_level": fixed_level,
+                    "bag": bag,
+                    "das": das,
+                    "arr": arr,
                 }
             if selected == 2:
                 fixed_level = not fixed_level
+            elif selected == 3:
+                bag = not bag
+
+
+KEY_ACTIONS = {
+    curses.KEY_LEFT: MOVE_LEFT,
+    curses.KEY_RIGHT: MOVE_RIGHT,
+    curses.KEY_UP: ROTATE,
+    curses.KEY_DOWN: SOFT_DROP,
+    ord(" "): HARD_DROP,
+}
+# A held soft drop repeats this often (seconds), with no delay.
+SOFT_DROP_ARR = 0.03
+
+
+def save_replay(g):
+    if not REPLAY_DIR or not g.actions:
+        return
+    import tetris_replay
+
+    try:
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        path = os.path.join(REPLAY_DIR, f"{int(time.time())}-{g.seed:016x}.trpl")
+        tetris_replay.save(path, g)
+    except OSError:
+        pass
 
 
-def run_game(stdscr, settings):
-    stdscr.nodelay(True)
+def run_game(stdscr, settings, store):
     stdscr.keypad(True)
 
     g = Game(
         start_level=settings["start_level"],
         speed_multiplier=settings["speed_multiplier"],
         fixed_level=settings["fixed_level"],
+        bag=settings.get("bag", False),
     )
-    last_tick = time.time()
-
-    while True:
-        now = time.time()
-        key = stdscr.getch()
+    started = time.monotonic()
+    try:
+        return play(stdscr, g, settings["das"] / 1000, settings["arr"] / 1000)
+    finally:
+        save_replay(g)
+        if g.actions:
+            store.record(
+                gamedb.Session(
+                    "tetris",
+                    g.score,
+                    time.monotonic() - started,
+                    mode="7-bag" if g.bag else "",
+                    level=g.level,
+                    lines=g.lines,
+                )
+            )
+
+
+def apply_input(g, actions, t, latency):
+    """Apply actions from a key read at time t, noting it if one locks the piece."""
+    for action in actions:
+        piece = g.cur
+        g.apply(action)
+        if g.cur is not piece:
+            latency.locked(t)
+        if g.game_over:
+            return
 
-        if key == ord("q"):
-            return "quit"
-        if key == ord("s"):
-            return "settings"
-        if key == ord("p") and not g.game_over:
-            g.paused = not g.paused
 
-        if not g.paused and not g.game_over:
-            if key == curses.KEY_LEFT:
-                g.move(-1)
-            elif key == curses.KEY_RIGHT:
-                g.move(1)
-            elif key == curses.KEY_UP:
-                g.rotate()
-            elif key == curses.KEY_DOWN:
-                g.soft_drop()
-            elif key == ord(" "):
-                g.hard_drop()
+def play(stdscr, g, das=0.17, arr=0.05):
+    screen = Screen(stdscr)
+    dirty = True
+    # One gravity step at most per wakeup; a late tick is not made up twice.
+    gravity = FrameClock(g.tick, max_steps=1)
+    shift = tetris_input.AutoShift(
+        KEY_ACTIONS,
+        {curses.KEY_LEFT: (das, arr), curses.KEY_RIGHT: (das, arr), curses.KEY_DOWN: (0.0, SOFT_DROP_ARR)},
+        blocked=lambda action: g.collides(g.cur.y, g.cur.x + (1 if action == MOVE_RIGHT else -1), g.cur.shape),
+    )
+    latency = tetris_input.LockLatency()
 
-            if now - last_tick >= g.tick:
-                g.soft_drop()
-                last_tick = now
+    while True:
+        if dirty:
+            draw(screen, g)
+            latency.shown(time.perf_counter())
+            dirty = False
+
+        # Sleep in getch() until a key arrives or the next gravity tick or
+        # auto-shift move is due; a paused or finished game waits for input only.
+        if g.paused or g.game_over:
+            stdscr.timeout(-1)
+        else:
+            wait = shift.timeout(time.perf_counter())
+            timeout = gravity.timeout_ms()
+            stdscr.timeout(timeout if wait is None else min(timeout, math.ceil(wait * 1000)))
+        # Every key pending is handled before the next frame, not one per frame.
+        for i, (t, key) in enumerate(tetris_input.drain(stdscr)):
+            tracing.check_key(key)
+            if key == ord("q"):
+                return "quit"
+            if key == ord("s"):
+                return "settings"
+            if key == ord("p") and not g.game_over:
+                g.paused = not g.paused
+                gravity.reset()
+                shift.release()
+                dirty = True
+            elif not g.paused and not g.game_over:
+                apply_input(g, shift.press(key, t, queued=i > 0), t, latency)
+                dirty = True
 
-        draw(stdscr, g)
-        time.sleep(0.01)
+        if not g.paused and not g.game_over:
+            now = time.perf_counter()
+            moves = shift.due(now)
+            if moves:
+                apply_input(g, moves, now, latency)
+                dirty = True
+
+            if gravity.due():
+                g.apply(GRAVITY)
+                gravity.step = g.tick
+                dirty = True
+
+
+DEFAULT_SETTINGS = {
+    "start_level": 1,
+    "speed_multiplier": 1.0,
+    "fixed_level": False,
+    "bag": False,
+    # Delayed auto-shift and auto-repeat rate, in milliseconds.
+    "das": 170,
+    "arr": 50,
+}
 
 
 def main(stdscr):
-    settings = {
-        "start_level": 1,
-        "speed_multiplier": 1.0,
-        "fixed_level": False,
-    }
+    with gamedb.Store() as store:
+        settings = {**DEFAULT_SETTINGS, **store.setting("tetris", "settings", {})}
 
-    while True:
-        action = run_game(stdscr, settings)
-        if action == "quit":
-            return
+        while True:
+            action = run_game(stdscr, settings, store)
+            if action == "quit":
+                return
 
-        # Open settings on demand, then start game immediately again.
-        new_settings = settings_screen(stdscr)
-        if new_settings is None:
-            return
-        settings = new_settings
+            # Open settings on demand, then start game immediately again.
+            new_settings = settings_screen(stdscr, settings)
+            if new_settings is None:
+                return
+            settings = new_settings
+            store.set_setting("tetris", "settings", settings)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Batched Tetris engine: many boards stepped by one call.
+
+Each board is a single int bitboard, bit y * BOARD_W + x set for a filled
+cell, and piece shapes are precomputed masks per rotation, so a collision
+test is one shift and one AND. Boards are kept as parallel lists (one
+entry per board) and step() applies one action to every live board.
+
+Rules, scoring and the piece stream match tetris.Game exactly: a board
+created with the same seed and fed the same actions ends in the same
+state. Actions are the tetris action codes (MOVE_LEFT ... GRAVITY).
+"""
+
+import random
+import time
+
+from tetris import (
+    BOARD_H,
+    BOARD_W,
+    GRAVITY,
+    HARD_DROP,
+    MOVE_LEFT,
+    MOVE_RIGHT,
+    PIECES,
+    ROTATE,
+    ROTATIONS as SHAPE_ROTATIONS,
+    SHAPES,
+    SOFT_DROP,
+    piece_sequence,
+)
+
+ROW_MASK = (1 << BOARD_W) - 1
+LINE_SCORES = [0, 100, 300, 500, 800]
+KICKS = (0, -1, 1, -2, 2)
+
+
+def shape_mask(shape):
+    mask = 0
+    for r, row in enumerate(shape):
+        for c, cell in enumerate(row):
+            if cell:
+                mask |= 1 << (r * BOARD_W + c)
+    return mask
+
+
+def build_rotations():
+    """Per kind, the four clockwise rotations as (shape, mask, width, height)."""
+    table = {}
+    for kind in PIECES:
+        table[kind] = [(shape, shape_mask(shape), len(shape[0]), len(shape)) for shape in SHAPE_ROTATIONS[kind]]
+    return table
+
+
+ROTATIONS = build_rotations()
+
+
+class TetrisBatch:
+    def __init__(self, n, seeds=None, bag=False, start_level=1, fixed_level=False):
+        self.n = n
+        self.bag = bag
+        self.start_level = max(1, start_level)
+        self.fixed_level = fixed_level
+        if seeds is None:
+            seeds = [random.getrandbits(64) for _ in range(n)]
+        self.seeds = list(seeds)
+        self.boards = [0] * n
+        self.kind = [""] * n
+        self.rot = [0] * n
+        self.x = [0] * n
+        self.y = [0] * n
+        self.next_kind = [""] * n
+        self.score = [0] * n
+        self.lines = [0] * n
+        self.level = [self.start_level] * n
+        self.game_over = [False] * n
+        self.pieces = [None] * n
+        for i in range(n):
+            self.reset(i, self.seeds[i])
+
+    def reset(self, i, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seeds[i] = seed
+        self.pieces[i] = piece_sequence(random.Random(seed), self.bag)
+        self.boards[i] = 0
+        self.score[i] = 0
+        self.lines[i] = 0
+        self.level[i] = self.start_level
+        self.game_over[i] = False
+        self.spawn(i, next(self.pieces[i]))
+        self.next_kind[i] = next(self.pieces[i])
+
+    def spawn(self, i, kind):
+        shape = SHAPES[kind]
+        self.kind[i] = kind
+        self.rot[i] = 0
+        self.y[i] = 0
+        self.x[i] = BOARD_W // 2 - len(shape[0]) // 2
+        if not self.fits(i, 0, 0, self.x[i]):
+            self.game_over[i] = True
+
+    def fits(self, i, rot, y, x):
+        _, mask, w, h = ROTATIONS[self.kind[i]][rot]
+        if x < 0 or x + w > BOARD_W or y + h > BOARD_H:
+            return False
+        return not (mask << (y * BOARD_W + x)) & self.boards[i]
+
+    def lock(self, i):
+        _, mask, _, h = ROTATIONS[self.kind[i]][self.rot[i]]
+        y = self.y[i]
+        board = self.boards[i] | (mask << (y * BOARD_W + self.x[i]))
+
+        # Only rows the piece touched can have become full.
+        cleared = 0
+        for r in range(y, y + h):
+            shift = r * BOARD_W
+            if (board >> shift) & ROW_MASK == ROW_MASK:
+                above = board & ((1 << shift) - 1)
+                below = (board >> (shift + BOARD_W)) << (shift + BOARD_W)
+                board = below | (above << BOARD_W)
+                cleared += 1
+        self.boards[i] = board
+
+        if cleared:
+            self.lines[i] += cleared
+            self.score[i] += LINE_SCORES[cleared] * self.level[i]
+            if not self.fixed_level:
+                self.level[i] = self.start_level + self.lines[i] // 10
+
+        self.spawn(i, self.next_kind[i])
+        self.next_kind[i] = next(self.pieces[i])
+
+    def step_one(self, i, action):
+        if self.game_over[i]:
+            return
+        y, x, rot = self.y[i], self.x[i], self.rot[i]
+        if action == MOVE_LEFT or action == MOVE_RIGHT:
+            nx = x - 1 if action == MOVE_LEFT else x + 1
+            if self.fits(i, rot, y, nx):
+                self.x[i] = nx
+        elif action == ROTATE:
+            nrot = (rot + 1) & 3
+            for kick in KICKS:
+                if self.fits(i, nrot, y, x + kick):
+                    self.rot[i] = nrot
+                    self.x[i] = x + kick
+                    break
+        elif action == HARD_DROP:
+            dropped = 0
+            while self.fits(i, rot, y + 1, x):
+                y += 1
+                dropped += 1
+            self.y[i] = y
+            self.score[i] += dropped * 2
+            self.lock(i)
+        else:
+            if self.fits(i, rot, y + 1, x):
+                self.y[i] = y + 1
+                self.score[i] += 1
+            else:
+                self.lock(i)
+
+    def step(self, actions):
+        """Apply actions[i] to board i for every board; finished boards are skipped."""
+        step_one = self.step_one
+        for i, action in enumerate(actions):
+            step_one(i, action)
+
+    def matrix(self, i):
+        """Board i as the row lists tetris.Game uses, without the falling piece."""
+        b = self.boards[i]
+        return [[(b >> (y * BOARD_W + x)) & 1 for x in range(BOARD_W)] for y in range(BOARD_H)]
+
+    def shape(self, i):
+        return ROTATIONS[self.kind[i]][self.rot[i]][0]
+
+
+def benchmark(n=1000, steps=200, seed=0):
+    """Return board steps per second for n boards under random play."""
+    rng = random.Random(seed)
+    codes = (MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP, GRAVITY, GRAVITY, HARD_DROP)
+    batch = TetrisBatch(n, seeds=range(n))
+    plan = [bytes(rng.choice(codes) for _ in range(n)) for _ in range(steps)]
+    start = time.perf_counter()
+    for actions in plan:
+        batch.step(actions)
+        for i in range(n):
+            if batch.game_over[i]:
+                batch.reset(i)
+    return n * steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():,.0f} board steps/s")
@@ -0,0 +1,198 @@
+"""
+Tetris keyboard input: drained, timestamped keys and DAS/ARR on a game clock.
+
+A terminal reports key presses only, never releases, and repeats a held
+key at a delay and rate of its own choosing. AutoShift turns that into
+consistent movement. Every press moves the piece once, including
+presses read together in one drain. A key counts as held only once it
+shows the terminal's repeat pattern: an event at least REPEAT_DELAY after
+the press (the first repeat, which also moves once, as it could be a
+second tap), then another within REPEAT_GAP. From then on its moves come
+from this clock instead: the first DAS after the press (at once if the
+terminal's delay was longer), then one every ARR, several per frame when
+ARR is shorter than a frame, and up to the wall when it is 0. Moves
+never run more than HORIZON repeat gaps ahead of the last repeat seen,
+so letting go stops the piece within about one terminal repeat.
+
+Set INPUT_STATS=1 to print input-to-lock latency (from reading the key to
+the frame showing the lock) when the game exits.
+"""
+
+import atexit
+import collections
+import os
+import sys
+import time
+
+INPUT_STATS = os.environ.get("INPUT_STATS")
+
+# A terminal's first repeat of a held key comes between these long after
+# the press; shorter gaps are separate presses.
+REPEAT_DELAY = 0.15
+FIRST_REPEAT = 0.75
+# Later repeats come at most this far apart.
+REPEAT_GAP = 0.1
+# Auto-shift moves may run this many repeat gaps ahead of the last repeat.
+HORIZON = 1.5
+# Repeats read in one burst are this far apart as far as the horizon goes.
+MIN_GAP = 0.02
+# Most moves made at once: more than any board is wide.
+MAX_SHIFT = 64
+# Samples kept for the latency percentiles.
+LATENCY_SAMPLES = 4096
+
+
+def drain(stdscr):
+    """Wait for a key as the window's timeout says, then read all pending keys; return [(time, key)]."""
+    key = stdscr.getch()
+    if key == -1:
+        return []
+    events = [(time.perf_counter(), key)]
+    stdscr.nodelay(True)
+    while True:
+        key = stdscr.getch()
+        if key == -1:
+            return events
+        events.append((time.perf_counter(), key))
+
+
+class AutoShift:
+    """Key events to actions, with delayed auto-shift for the held key.
+
+    actions maps keys to actions; rates maps the keys that auto-shift to
+    (delay, interval) in seconds. Other keys act once per event.
+    blocked(action) says whether an action would do nothing right now;
+    an interval of 0 shifts until it does.
+    """
+
+    def __init__(self, actions, rates, blocked=None):
+        self.actions = actions
+        self.rates = rates
+        self.blocked = blocked or (lambda action: False)
+        self.release()
+
+    def release(self):
+        """Forget the held key, e.g. on pause."""
+        self.key = None
+        self.held = False
+        # Whether the last event of key may have been its first repeat.
+        self.repeated = False
+        self.pressed = self.last = self.next = 0.0
+        self.gap = REPEAT_GAP
+
+    def press(self, key, t, queued=False):
+        """Return the actions key, read at time t, applies right away.
+
+        queued marks a key read in the same drain as the one before it,
+        which is a separate press unless its key is already held.
+        """
+        action = self.actions.get(key)
+        if action is None:
+            return []
+        if key not in self.rates:
+            return [action]
+        gap = t - self.last
+        if key == self.key:
+            if self.held and gap <= self.release_after():
+                # Repeats of a held key only show it is still held.
+                self.last = t
+                self.gap = max(gap, MIN_GAP)
+                return []
+            if self.repeated and not queued and gap <= REPEAT_GAP:
+                das, _ = self.rates[key]
+                self.held = True
+                self.last = t
+                self.gap = max(gap, MIN_GAP)
+                self.next = max(self.pressed + das, t)
+                return []
+            if not self.repeated and not queued and REPEAT_DELAY <= gap <= FIRST_REPEAT:
+                # The terminal's first repeat, or a second tap: one move either way.
+                self.repeated = True
+                self.last = t
+                return [action]
+        self.key = key
+        self.action = action
+        self.held = self.repeated = False
+        self.pressed = self.last = t
+        return [action]
+
+    def horizon(self):
+        return self.last + HORIZON * self.gap
+
+    def release_after(self):
+        """Return how long after its last repeat a held key counts as let go."""
+        return REPEAT_GAP + HORIZON * self.gap
+
+    def due(self, now):
+        """Return the auto-shift actions due by now."""
+        if not self.held:
+            return []
+        if now - self.last > self.release_after():
+            self.release()
+            return []
+        _, arr = self.rates[self.key]
+        until = min(now, self.horizon())
+        if self.next > until:
+            return []
+        if arr <= 0:
+            self.next = float("inf")
+            return self.to_wall()
+        n = min(MAX_SHIFT, int((until - self.next) / arr) + 1)
+        self.next += n * arr
+        return [self.action] * n
+
+    def to_wall(self):
+        """Yield the held action until it is blocked, checking before each one."""
+        for _ in range(MAX_SHIFT):
+            if self.blocked(self.action):
+                return
+            yield self.action
+
+    def timeout(self, now):
+        """Return seconds until the next auto-shift move, or None if none is due before another key."""
+        if not self.held or self.next > self.horizon():
+            return None
+        return max(0.0, self.next - now)
+
+
+class LockLatency:
+    """Times from reading the key that locked a piece to the frame that shows it."""
+
+    def __init__(self):
+        self.samples = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.pending = []
+        if INPUT_STATS:
+            latencies.append(self)
+
+    def locked(self, t):
+        self.pending.append(t)
+
+    def shown(self, now):
+        self.samples.extend(now - t for t in self.pending)
+        self.pending.clear()
+
+    def summary(self):
+        return summary(self.samples)
+
+
+def summary(samples):
+    if not samples:
+        return "no locks from input"
+    s = sorted(samples)
+    n = len(s)
+    return (
+        f"{n} locks, input-to-lock latency p50 {s[n // 2] * 1000:.2f} ms "
+        f"p99 {s[min(n - 1, n * 99 // 100)] * 1000:.2f} ms max {s[-1] * 1000:.2f} ms"
+    )
+
+
+# Every LockLatency made while INPUT_STATS is set, summarized together at exit.
+latencies = []
+
+
+def print_stats():
+    print(f"input: {summary([t for latency in latencies for t in latency.samples])}", file=sys.stderr)
+
+
+if INPUT_STATS:
+    atexit.register(print_stats)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tetris replay files and a headless batch verifier.
+
+A replay stores the game settings, the piece seed, the claimed result and
+every input the game applied (see tetris.Game.apply), two per byte.
+Re-running the inputs on a fresh Game with the same seed must reproduce
+the claimed score and lines.
+
+Usage:
+  python tetris_replay.py [-j WORKERS] REPLAY...
+"""
+
+import argparse
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import tetris
+
+MAGIC = b"TRPL"
+VERSION = 1
+# magic, version, seed, bag, start level, speed, fixed level, score, lines, action count
+HEADER = struct.Struct("<4sBQ?Bd?III")
+
+
+def pack_actions(actions):
+    out = bytearray((len(actions) + 1) // 2)
+    for i, a in enumerate(actions):
+        out[i >> 1] |= a << (4 * (i & 1))
+    return bytes(out)
+
+
+def unpack_actions(data, count):
+    return bytes((data[i >> 1] >> (4 * (i & 1))) & 0xF for i in range(count))
+
+
+def dumps(g):
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        g.seed,
+        g.bag,
+        g.start_level,
+        g.speed_multiplier,
+        g.fixed_level,
+        g.score,
+        g.lines,
+        len(g.actions),
+    )
+    return header + pack_actions(g.actions)
+
+
+def loads(data):
+    """Return (settings, claimed score, claimed lines, actions) from replay bytes."""
+    if len(data) < HEADER.size:
+        raise ValueError("truncated replay header")
+    magic, version, seed, bag, start_level, speed, fixed_level, score, lines, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a Tetris replay")
+    body = data[HEADER.size:]
+    if len(body) != (count + 1) // 2:
+        raise ValueError("replay length does not match its action count")
+    settings = {
+        "seed": seed,
+        "bag": bag,
+        "start_level": start_level,
+        "speed_multiplier": speed,
+        "fixed_level": fixed_level,
+    }
+    return settings, score, lines, unpack_actions(body, count)
+
+
+def save(path, g):
+    with open(path, "wb") as f:
+        f.write(dumps(g))
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def replay(settings, actions):
+    """Run actions on a fresh Game at full speed and return it."""
+    g = tetris.Game(**settings)
+    for a in actions:
+        g.apply(a)
+    return g
+
+
+def verify(path):
+    """Return (path, ok, message) for one replay file."""
+    try:
+        settings, score, lines, actions = load(path)
+    except (OSError, ValueError) as e:
+        return path, False, str(e)
+    g = replay(settings, actions)
+    if (g.score, g.lines) != (score, lines):
+        return path, False, f"claimed {score}/{lines}, replayed {g.score}/{g.lines}"
+    return path, True, f"score {score}, lines {lines}"
+
+
+def verify_many(paths, workers=None):
+    """Verify replays across a process pool, yielding results in input order."""
+    if workers == 1 or len(paths) < 2:
+        yield from map(verify, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(verify, paths, chunksize=max(1, len(paths) // 64))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify Tetris replay files.")
+    parser.add_argument("replays", nargs="+")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    failed = 0
+    for path, ok, msg in verify_many(args.replays, args.workers):
+        print(f"{'OK  ' if ok else 'FAIL'} {path}: {msg}")
+        failed += not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Tracing of the games' hot paths, costing nothing while it is off.
+
+Functions marked @traced run untouched until tracing is turned on. Turning
+it on swaps each one, on its module or class, for a wrapper that appends
+(name, start, duration, thread) to a ring buffer of the last RING events;
+turning it off puts the originals back. Code that calls them through the
+module or the instance (as the games do) needs no changes.
+
+Set TRACE=FILE to trace from startup, or press ` (backtick) in a game to
+toggle tracing. At exit the buffered events are written to FILE
+(trace.json by default) as Chrome trace-event JSON, which chrome://tracing
+and Perfetto open, and a duration histogram per span goes to stderr.
+"""
+
+import atexit
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+TRACE = os.environ.get("TRACE")
+RING = 1 << 16
+TOGGLE_KEY = ord("`")
+
+events = collections.deque(maxlen=RING)
+# (name, function) of everything marked @traced, in marking order.
+marked = []
+enabled = False
+exit_hooked = False
+
+
+def traced(fn):
+    """Mark fn as a span named file.qualname; it is only wrapped while tracing is on."""
+    stem = os.path.splitext(os.path.basename(fn.__globals__.get("__file__", fn.__module__)))[0]
+    name = f"{stem}.{fn.__qualname__}"
+    marked.append((name, fn))
+    # Already tracing (TRACE was set): the definition itself binds the wrapper.
+    return wrap(name, fn) if enabled else fn
+
+
+def owner(fn):
+    target = sys.modules[fn.__module__]
+    for part in fn.__qualname__.split(".")[:-1]:
+        target = getattr(target, part)
+    return target
+
+
+def wrap(name, fn):
+    perf_counter_ns = time.perf_counter_ns
+    get_ident = threading.get_ident
+
+    @functools.wraps(fn)
+    def span(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            events.append((name, start, perf_counter_ns() - start, get_ident()))
+
+    return span
+
+
+def install(name, fn):
+    setattr(owner(fn), fn.__name__, wrap(name, fn))
+
+
+def enable():
+    global enabled, exit_hooked
+    if enabled:
+        return
+    enabled = True
+    for name, fn in marked:
+        install(name, fn)
+    if not exit_hooked:
+        exit_hooked = True
+        atexit.register(dump)
+
+
+def disable():
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    for _, fn in marked:
+        setattr(owner(fn), fn.__name__, fn)
+
+
+def toggle():
+    if enabled:
+        disable()
+    else:
+        enable()
+
+
+def check_key(key):
+    """Toggle tracing if key is TOGGLE_KEY; return whether it was."""
+    if key != TOGGLE_KEY:
+        return False
+    toggle()
+    return True
+
+
+def chrome_trace(evs):
+    """Return evs as a Chrome trace-event document of complete ("X") events."""
+    pid = os.getpid()
+    origin = min((start for _, start, _, _ in evs), default=0)
+    return {
+        "displayTimeUnit": "ms",
+        "traceEvents": [
+            {"name": name, "ph": "X", "ts": (start - origin) / 1000, "dur": dur / 1000, "pid": pid, "tid": tid}
+            for name, start, dur, tid in evs
+        ],
+    }
+
+
+def summary(evs):
+    """Return per-span count, mean, percentiles, max and a log2 histogram of durations, in microseconds."""
+    by_name = collections.defaultdict(list)
+    for name, _, dur, _ in evs:
+        by_name[name].append(dur / 1000)
+    lines = []
+    for name, durs in sorted(by_name.items(), key=lambda item: -sum(item[1])):
+        durs.sort()
+        n = len(durs)
+        lines.append(
+            f"{name:<32} {n:7d} calls  mean {sum(durs) / n:9.1f}us  p50 {durs[n // 2]:9.1f}us  "
+            f"p99 {durs[min(n - 1, n * 99 // 100)]:9.1f}us  max {durs[-1]:9.1f}us"
+        )
+        # Bucket b holds durations in [2**(b-1), 2**b) us; bucket 0 is under 1 us.
+        buckets = collections.Counter(int(d).bit_length() for d in durs)
+        lines.append(
+            "    "
+            + "  ".join(
+                f"{'<1' if b == 0 else 2 ** (b - 1)}us:{buckets[b]}" for b in range(max(buckets) + 1) if buckets[b]
+            )
+        )
+    return "\n".join(lines)
+
+
+def dump(path=None):
+    """Write the buffered events as a Chrome trace and print their summary."""
+    evs = list(events)
+    if not evs:
+        return
+    path = path or TRACE or "trace.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(evs), f)
+    print(f"trace: {len(evs)} events written to {path}", file=sys.stderr)
+    print(summary(evs), file=sys.stderr)
+
+
+if TRACE:
+    enable()